@@ -0,0 +1,67 @@
+"""
+Benchmark of the fast Excel writer against DataFrame.to_excel
+
+Builds a GenericMergeLoader-like output (one row per country and year, one
+column per variable) and writes it with `to_excel` (openpyxl), the fast
+writer's openpyxl write-only path and, when installed, xlsxwriter in
+constant_memory mode. Every output is read back and compared to what is
+read back from the `to_excel` output.
+
+    python -m benchmarks.excel_writer --variables 60
+"""
+
+from pathlib import Path
+import tempfile
+import argparse
+import time
+
+
+from benchmarks.merge_loader import make_variables
+from loaders.generic import GenericMergeLoader
+from utils.countries import registry
+from utils.excel import read_excel_sheets, write_excel_fast, xlsxwriter
+
+
+def merged_dataset(variables, countries, years):
+    dataset = registry.encode_frames(make_variables(variables, countries, years))
+    with tempfile.TemporaryDirectory() as tmp:
+        loader = GenericMergeLoader(data_dir=tmp, save_dir=tmp)
+        return loader.merge_indexed(dataset).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--variables", type=int, default=60)
+    parser.add_argument("--countries", type=int, default=250)
+    parser.add_argument("--years", type=int, default=60)
+    args = parser.parse_args()
+
+    data = merged_dataset(args.variables, args.countries, args.years)
+    writers = {
+        "to_excel (openpyxl)": lambda d, fn: d.to_excel(fn, index=False),
+        "fast (openpyxl write-only)": lambda d, fn: write_excel_fast(
+            d, fn, engine="openpyxl"
+        ),
+    }
+    if xlsxwriter is not None:
+        writers["fast (xlsxwriter constant_memory)"] = lambda d, fn: write_excel_fast(
+            d, fn, engine="xlsxwriter"
+        )
+
+    print(f"{data.shape[0]} rows x {data.shape[1]} columns")
+    expected = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, (name, write) in enumerate(writers.items()):
+            fn = Path(tmp) / f"{i}.xlsx"
+            start = time.perf_counter()
+            write(data, fn)
+            elapsed = time.perf_counter() - start
+            written = read_excel_sheets(fn)
+            expected = written if expected is None else expected
+            same = written.equals(expected)
+            size = fn.stat().st_size / 1024 / 1024
+            print(f"{name:36}: {elapsed:7.3f}s  {size:6.2f} MB  identical: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Synthetic GTI csv files and UNCTADstat 7z archives at configurable scales
+
+The files mimic the layout of the real sources closely enough to go through
+the extractors, transformers and loaders unchanged: GTI has one csv per year
+with `index_*` score columns plus columns the transformer drops, UNCTADstat
+has one 7z archive per variable holding a csv with the label, footnote and
+missing value columns of the bulk downloads. A few country names use the
+spellings the country registry normalizes.
+"""
+
+from pathlib import Path
+import io
+
+import numpy as np
+import pandas as pd
+import py7zr
+
+GTI_UPLOAD = "2024"
+GTI_SCORES = ["over", "inci", "fat", "inj", "prop"]
+ALIASED_COUNTRIES = ["Egypt, Arab Rep.", "Cote d' Ivoire", "Republic of the Congo"]
+
+
+def country_names(countries):
+    names = ALIASED_COUNTRIES[:countries]
+    names += [f"Country {i:03d}" for i in range(countries - len(names))]
+    return names
+
+
+def gti_frame(year, countries, rng):
+    names = country_names(countries)
+    data = {
+        "name": names,
+        "code": [f"C{i:03d}" for i in range(countries)],
+        "year": year,
+        "rank": rng.permutation(countries) + 1,
+    }
+    for score in GTI_SCORES:
+        data[f"index_{score}"] = rng.random(countries).round(3) * 10
+    data["banded"] = rng.integers(0, 5, countries)
+    return pd.DataFrame(data)
+
+
+def unctad_frame(measure, years, countries, categories, rng):
+    names = country_names(countries)
+    rows = pd.MultiIndex.from_product(
+        [range(2000, 2000 + years), range(countries), range(categories)],
+        names=["Year", "Economy", "Category"],
+    ).to_frame(index=False)
+    data = pd.DataFrame({"Year": rows["Year"], "Economy": rows["Economy"]})
+    data["Economy Label"] = [names[i] for i in rows["Economy"]]
+    if categories > 1:
+        data["Category"] = rows["Category"]
+        data["Category Label"] = "Category " + rows["Category"].astype(str)
+    # every variable measures something different, e.g "Index" or "Percentage"
+    data[measure] = rng.random(len(rows)).round(4) * 1000
+    data[f"{measure} Footnote"] = ""
+    data[f"{measure} Missing value"] = ""
+    return data
+
+
+def write_gti(root, years, countries, seed=0):
+    """Writes GTI_<year>_<upload>.csv files under `root` and returns their paths"""
+    rng = np.random.default_rng(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    files = []
+    for year in years:
+        fn = root / f"GTI_{year}_{GTI_UPLOAD[-2:]}.csv"
+        gti_frame(year, countries, rng).to_csv(fn, index=False)
+        files.append(fn)
+    return files
+
+
+def write_unctad(root, variables, years, countries, categories=1, seed=0):
+    """Writes one <variable>.7z archive per variable under `root`"""
+    rng = np.random.default_rng(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    files = []
+    for variable in variables:
+        name = variable.replace(".", "_", 1)
+        buffer = io.StringIO()
+        measure = f"{variable.split('.')[-1]} Value"
+        data = unctad_frame(measure, years, countries, categories, rng)
+        data.to_csv(buffer, index=False)
+        fn = root / f"{name}.7z"
+        with py7zr.SevenZipFile(fn, "w") as archive:
+            archive.writestr(buffer.getvalue(), f"{variable.replace('.', '_')}.csv")
+        files.append(fn)
+    return files
+
+
+def unctad_variables(count):
+    return [f"US.Var{i:03d}" for i in range(count)]
+
+
+def write_fixtures(
+    root,
+    gti_years=13,
+    countries=200,
+    variables=10,
+    unctad_years=30,
+    categories=1,
+    seed=0,
+):
+    root = Path(root)
+    years = range(2011, 2011 + gti_years)
+    write_gti(root / "gti", years, countries, seed)
+    write_unctad(
+        root / "unctad",
+        unctad_variables(variables),
+        unctad_years,
+        countries,
+        categories,
+        seed,
+    )
+    return root
@@ -0,0 +1,80 @@
+"""
+Benchmark of the transform -> load handoff for each intermediate file type
+
+Writes synthetic transformed datasets the way a transformer does and reads
+them back the way a loader does, timing both sides.
+
+    python -m benchmarks.handoff --files 20 --rows 20000
+"""
+
+from pathlib import Path
+import argparse
+import tempfile
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.io import IOMixin
+
+
+class HandoffStage(IOMixin):
+    """Minimal IOMixin user standing in for a transformer/loader pair"""
+
+    default_data_dir = ""
+    default_save_dir = ""
+
+    def __init__(self, directory, save_file_type):
+        self.logger = logging.getLogger("ETL.Benchmark.handoff")
+        self.save_file_type = save_file_type
+        self.setup_directories(directory, directory)
+
+
+def make_dataset(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    countries = [f"Country {i}" for i in range(200)]
+    return pd.DataFrame(
+        {
+            "Country Name": rng.choice(countries, rows),
+            "Country Code": rng.choice([c[-3:] for c in countries], rows),
+            "year": rng.integers(2000, 2024, rows),
+            "overall": rng.random(rows) * 10,
+            "inci": rng.integers(0, 500, rows),
+            "fat": rng.integers(0, 500, rows),
+        }
+    )
+
+
+def run(save_file_type, datasets):
+    with tempfile.TemporaryDirectory() as tmp:
+        stage = HandoffStage(Path(tmp), save_file_type)
+        start = time.perf_counter()
+        for i, data in enumerate(datasets):
+            stage.write(f"dataset_{i}", data)
+        written = time.perf_counter()
+        stage.fetch()
+        read = time.perf_counter()
+    return written - start, read - written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--types", nargs="+", default=["excel", "csv", "parquet"])
+    args = parser.parse_args()
+
+    datasets = [make_dataset(args.rows, seed=i) for i in range(args.files)]
+    print(f"{args.files} files x {args.rows} rows")
+    print(f"{'type':<10}{'write (s)':>12}{'read (s)':>12}{'total (s)':>12}")
+    for save_file_type in args.types:
+        write_time, read_time = run(save_file_type, datasets)
+        print(
+            f"{save_file_type:<10}{write_time:>12.3f}{read_time:>12.3f}"
+            f"{write_time + read_time:>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
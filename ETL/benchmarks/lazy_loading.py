@@ -0,0 +1,86 @@
+"""
+Benchmark of the lazy dataset handoff to GTILoader against the full fetch
+
+Writes GTI-like transformed parquet files, one per year, and loads them with
+GTILoader once from a fully fetched list and once from a lazy iterator. Each
+load runs in a fresh process so the peak resident memory it reports covers
+only that load; the output is written as parquet so the Excel writer does not
+dominate the figures.
+
+    python -m benchmarks.lazy_loading --years 20 --rows 200000
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import multiprocessing
+import tempfile
+import argparse
+import resource
+import time
+
+import numpy as np
+import pandas as pd
+
+SCORES = ["overall", "incidents", "fatalities", "injuries", "property"]
+
+
+def write_years(directory, years, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    countries = [f"Country {i:03d}" for i in range(250)]
+    directory.mkdir(parents=True, exist_ok=True)
+    for year in range(2000, 2000 + years):
+        data = pd.DataFrame(
+            {
+                "Country Name": rng.choice(countries, rows),
+                "Country Code": rng.choice([c[-3:] for c in countries], rows),
+                "year": year,
+            }
+        )
+        for score in SCORES:
+            data[f"{score}_score"] = rng.random(rows)
+        data.to_parquet(directory / f"gti_{year}.parquet", index=False)
+
+
+def load(data_dir, save_dir, lazy):
+    from loaders.gti_loader import GTILoader
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    loader = GTILoader(
+        data_dir=data_dir,
+        save_dir=save_dir,
+        save_file_type="parquet",
+        fetch_workers=1,
+        lazy=lazy,
+    )
+    start = time.perf_counter()
+    loader.load_data()
+    elapsed = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on linux
+    return elapsed, (after - before) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / "transformed"
+        write_years(data_dir, args.years, args.rows)
+        outputs = {}
+        for name, lazy in [("list", False), ("lazy", True)]:
+            save_dir = Path(tmp) / name
+            with ProcessPoolExecutor(1, mp_context=context) as executor:
+                elapsed, peak = executor.submit(load, data_dir, save_dir, lazy).result()
+            outputs[name] = pd.read_parquet(save_dir / "gti.parquet")
+            print(f"{name:5}: {elapsed:7.3f}s  peak memory growth {peak:8.1f} MB")
+        size = outputs["list"].memory_usage(deep=True).sum() / 1024 / 1024
+        print(f"output frame: {size:.1f} MB")
+        print(f"identical: {outputs['list'].equals(outputs['lazy'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark of the logging path at extractor log volume
+
+Logs `--downloads` x 5 INFO records, the lines BaseExtractor writes per
+download, through the stdlib QueueHandler/QueueListener/FileHandler setup
+with eagerly formatted f-string messages and `json.dumps` (the previous
+configuration), then through the deferred queue handler, batching listener
+and file handler of configs/log.json with %-style arguments. The records
+are logged before the listener starts, so the time reported for the
+logging thread (the extraction event loop in the pipeline) is not mixed
+with the listener's work; the listener's time to write them all and the
+cost of the JSON formatter alone are reported separately.
+
+    python -m benchmarks.logging_volume --downloads 20000
+"""
+
+from pathlib import Path
+import logging.handlers
+import tempfile
+import argparse
+import logging
+import queue
+import json
+import time
+
+from utils.log import (
+    BatchFileHandler,
+    BatchQueueListener,
+    DeferredQueueHandler,
+    JsonFormatter,
+    orjson,
+)
+
+CONFIG = Path(__file__).resolve().parents[1] / "configs" / "log.json"
+
+
+class LegacyJsonFormatter(JsonFormatter):
+    def format(self, record):
+        return json.dumps(self._prepare_log_dict(record), default=str)
+
+
+def fmt_keys():
+    config = json.loads(CONFIG.read_text())
+    return config["formatters"]["json"]["fmt_keys"]
+
+
+def log_eager(logger, i):
+    name, url, path = f"US_Var{i}", f"https://example.org/US.Var{i}", f"data/{i}.csv"
+    logger.info(f"Schedulling Request : {name} from {url}")
+    logger.info(f"Sending Request: {url}")
+    logger.info(f"Response Received (200) - {name} from {url}")
+    logger.info(f"Streaming Download : {name} to {path}")
+    logger.info(f"Write Operation Complete : {name} to {path}")
+
+
+def log_deferred(logger, i):
+    name, url, path = f"US_Var{i}", f"https://example.org/US.Var{i}", f"data/{i}.csv"
+    logger.info("Schedulling Request : %s from %s", name, url)
+    logger.info("Sending Request: %s", url)
+    logger.info("Response Received (%s) - %s from %s", 200, name, url)
+    logger.info("Streaming Download : %s to %s", name, path)
+    logger.info("Write Operation Complete : %s to %s", name, path)
+
+
+def run(name, directory, downloads):
+    filename = directory / f"{name}.log"
+    if name == "stdlib":
+        handler = logging.FileHandler(filename)
+        handler.setFormatter(LegacyJsonFormatter(fmt_keys=fmt_keys()))
+        queue_handler_class = logging.handlers.QueueHandler
+        listener_class = logging.handlers.QueueListener
+        log = log_eager
+    else:
+        handler = BatchFileHandler(filename)
+        handler.setFormatter(JsonFormatter(fmt_keys=fmt_keys()))
+        queue_handler_class = DeferredQueueHandler
+        listener_class = BatchQueueListener
+        log = log_deferred
+
+    records = queue.Queue()
+    listener = listener_class(records, handler, respect_handler_level=True)
+    logger = logging.getLogger(f"ETL.Benchmark.{name}")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(queue_handler_class(records))
+
+    start = time.perf_counter()
+    for i in range(downloads):
+        log(logger, i)
+    logged = time.perf_counter()
+    listener.start()
+    listener.stop()
+    written = time.perf_counter()
+    handler.close()
+    lines = sum(1 for _ in open(filename))
+    return logged - start, written - logged, lines
+
+
+def formatter_time(formatter, records):
+    start = time.perf_counter()
+    for record in records:
+        formatter.format(record)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--downloads", type=int, default=20000)
+    args = parser.parse_args()
+    count = args.downloads * 5
+
+    print(f"{count} records, json encoder: {'orjson' if orjson else 'json'}")
+    print(f"{'setup':<10}{'caller (us/rec)':>17}{'caller (s)':>12}{'writing (s)':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("stdlib", "deferred"):
+            logged, written, lines = run(name, Path(tmp), args.downloads)
+            print(
+                f"{name:<10}{logged / count * 1e6:>17.2f}{logged:>12.3f}"
+                f"{written:>13.3f}"
+            )
+            assert lines == count, f"{name}: {lines} of {count} records written"
+
+    records = [
+        logging.LogRecord(
+            "ETL.Benchmark",
+            logging.INFO,
+            __file__,
+            1,
+            "Sending Request: %s",
+            (i,),
+            None,
+        )
+        for i in range(count)
+    ]
+    legacy = formatter_time(LegacyJsonFormatter(fmt_keys=fmt_keys()), records)
+    current = formatter_time(JsonFormatter(fmt_keys=fmt_keys()), records)
+    print(f"formatter : json.dumps {legacy:.3f}s, JsonFormatter {current:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark of the in-memory transform -> load handoff against the disk path
+
+Writes extracted GTI and UNCTADstat csv files (see benchmarks.fixtures) and
+runs the GTI and UNCTADstat transformers and loaders on them, once handing
+the intermediates over through parquet files in `data/*/transformed`, once
+through a FrameStore the workers pickle their frames back to and once
+through a FrameStore in shared memory (Arrow IPC streams). The loaders write parquet so the Excel writer does
+not dominate the figures. Median times over `--repeat` runs are reported and
+the loaded outputs of the in-memory paths are compared to the disk path.
+
+    python -m benchmarks.memory_handoff --countries 1000 --variables 20
+"""
+
+from pathlib import Path
+import statistics
+import tempfile
+import argparse
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fixtures import write_gti, unctad_frame, unctad_variables
+
+
+def write_extracted(root, args):
+    write_gti(
+        root / "gti" / "extracted", range(2000, 2000 + args.gti_years), args.countries
+    )
+    extracted = root / "unctadstat" / "extracted"
+    extracted.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(0)
+    for variable in unctad_variables(args.variables):
+        measure = f"{variable.split('.')[-1]} Value"
+        data = unctad_frame(
+            measure, args.unctad_years, args.countries, args.categories, rng
+        )
+        data.to_csv(extracted / f"{variable.replace('.', '_')}.csv", index=False)
+
+
+def run(root, store, pool):
+    from transformers.gti import GTITransformer
+    from transformers.unctadstat import UnctadStatTransformer
+    from loaders.gti_loader import GTILoader
+    from loaders.unctadstat_loader import UnctadStatLoader
+
+    for stage in ("transformed", "loaded"):
+        for source in ("gti", "unctadstat"):
+            shutil.rmtree(root / source / stage, ignore_errors=True)
+    transformers = [
+        GTITransformer(
+            data_dir=root / "gti" / "extracted",
+            save_dir=root / "gti" / "transformed",
+            cache_dir=root / ".cache",
+        ),
+        UnctadStatTransformer(
+            data_dir=root / "unctadstat" / "extracted",
+            save_dir=root / "unctadstat" / "transformed",
+            cache_dir=root / ".cache",
+        ),
+    ]
+    loaders = [
+        GTILoader(
+            data_dir=root / "gti" / "transformed",
+            save_dir=root / "gti" / "loaded",
+            save_file_type="parquet",
+        ),
+        UnctadStatLoader(
+            data_dir=root / "unctadstat" / "transformed",
+            save_dir=root / "unctadstat" / "loaded",
+            save_file_type="parquet",
+        ),
+    ]
+    start = time.perf_counter()
+    for transformer in transformers:
+        transformer.run_transformation(pool=pool, store=store)
+    transformed = time.perf_counter()
+    for loader in loaders:
+        loader.load_data(store=store)
+    loaded = time.perf_counter()
+    if store is not None:
+        store.clear()
+    outputs = [
+        pd.read_parquet(root / source / "loaded" / "gti.parquet")
+        for source in ("gti", "unctadstat")
+    ]
+    return transformed - start, loaded - transformed, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--gti-years", type=int, default=13)
+    parser.add_argument("--countries", type=int, default=1000)
+    parser.add_argument("--variables", type=int, default=20)
+    parser.add_argument("--unctad-years", type=int, default=30)
+    parser.add_argument("--categories", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from utils.store import FrameStore
+    from utils.workers import WorkerPool
+
+    results = dict()
+    with tempfile.TemporaryDirectory() as tmp, WorkerPool(args.workers) as pool:
+        root = Path(tmp) / "data"
+        write_extracted(root, args)
+        stores = [
+            ("disk", None),
+            ("memory", FrameStore()),
+            ("shared", FrameStore(shared_memory=True)),
+        ]
+        for name, store in stores:
+            runs = [run(root, store, pool) for _ in range(args.repeat)]
+            results[name] = (
+                statistics.median(r[0] for r in runs),
+                statistics.median(r[1] for r in runs),
+                runs[-1][2],
+            )
+
+    print(f"{'handoff':<10}{'transform (s)':>15}{'load (s)':>12}{'total (s)':>12}")
+    for name, (transform_time, load_time, _) in results.items():
+        print(
+            f"{name:<10}{transform_time:>15.3f}{load_time:>12.3f}"
+            f"{transform_time + load_time:>12.3f}"
+        )
+    for name in ("memory", "shared"):
+        same = all(
+            disk.equals(output)
+            for disk, output in zip(results["disk"][2], results[name][2])
+        )
+        print(f"{name} identical to disk: {same}")
+
+
+if __name__ == "__main__":
+    main()
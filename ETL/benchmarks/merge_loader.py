@@ -0,0 +1,66 @@
+"""
+Benchmark of GenericMergeLoader's single indexed join against the pairwise merge
+
+Builds one synthetic variable file per UNCTADstat-like variable, keyed on
+("Country Name", "year"), and merges them with both strategies.
+
+    python -m benchmarks.merge_loader --variables 60
+"""
+
+import tempfile
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from loaders.generic import GenericMergeLoader
+from utils.countries import registry
+
+
+def make_variables(variables, countries, years, seed=0):
+    rng = np.random.default_rng(seed)
+    keys = pd.MultiIndex.from_product(
+        [[f"Country {i}" for i in range(countries)], range(1990, 1990 + years)],
+        names=["Country Name", "year"],
+    ).to_frame(index=False)
+    dataset = []
+    for i in range(variables):
+        # each source covers a different subset of countries and years
+        data = keys.sample(frac=rng.uniform(0.6, 1.0), random_state=i)
+        data[f"variable_{i}"] = rng.random(len(data))
+        dataset.append(data.reset_index(drop=True))
+    return dataset
+
+
+def timed(merge, dataset):
+    frames = registry.encode_frames([data.copy() for data in dataset])
+    start = time.perf_counter()
+    merged_data = merge(frames)
+    return time.perf_counter() - start, merged_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--variables", type=int, default=60)
+    parser.add_argument("--countries", type=int, default=250)
+    parser.add_argument("--years", type=int, default=60)
+    args = parser.parse_args()
+
+    dataset = make_variables(args.variables, args.countries, args.years)
+    with tempfile.TemporaryDirectory() as tmp:
+        loader = GenericMergeLoader(data_dir=tmp, save_dir=tmp)
+        pairwise_time, pairwise = timed(loader.merge_pairwise, dataset)
+        indexed_time, indexed = timed(loader.merge_indexed, dataset)
+
+    same = pairwise.reset_index(drop=True).equals(indexed.reset_index(drop=True))
+    print(
+        f"{args.variables} variables x {args.countries} countries x {args.years} years"
+    )
+    print(f"pairwise merge : {pairwise_time:.3f}s")
+    print(f"indexed join   : {indexed_time:.3f}s")
+    print(f"identical output: {same}")
+
+
+if __name__ == "__main__":
+    main()
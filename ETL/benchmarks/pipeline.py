@@ -0,0 +1,246 @@
+"""
+End-to-end pipeline benchmark against a local mock of the data sources
+
+Generates synthetic GTI and UNCTADstat fixtures (see benchmarks.fixtures),
+serves them from a local aiohttp server (benchmarks.server) and runs the
+full Pipeline against it in a scratch directory, `--repeat` times from a
+clean state. The median wall/cpu time and the throughput of each stage are
+printed and, with `--output`, saved as JSON. `--compare` checks the run
+against a saved result and exits with status 1 when a stage got slower than
+`--tolerance` allows, so regressions are caught before deploy.
+
+    python -m benchmarks.pipeline --countries 200 --variables 10 --output base.json
+    python -m benchmarks.pipeline --countries 200 --variables 10 --compare base.json
+"""
+
+from pathlib import Path
+import statistics
+import platform
+import tempfile
+import argparse
+import datetime
+import shutil
+import json
+import sys
+import os
+
+from benchmarks.fixtures import write_fixtures, unctad_variables, GTI_UPLOAD
+from benchmarks.server import MockSourceServer
+
+ETL_ROOT = Path(__file__).resolve().parents[1]
+STAGES = {
+    "Extraction": "extraction",
+    "Transformation": "transformation",
+    "Loading": "loading",
+}
+
+
+def prepare_workdir(workdir):
+    """Runs happen in `workdir`, with the project's logging config available"""
+    (workdir / "logs").mkdir(parents=True, exist_ok=True)
+    configs = workdir / "configs"
+    if not configs.exists():
+        configs.symlink_to(ETL_ROOT / "configs")
+    os.chdir(workdir)
+
+
+def build_pipeline(args, server):
+    from extractors.gti import GTIExtractor
+    from extractors.unctadstat import UnctadStatExtractor
+    from transformers.gti import GTITransformer
+    from transformers.unctadstat import UnctadStatTransformer
+    from loaders.unctadstat_loader import UnctadStatLoader, UnctadStatSQLiteLoader
+    from loaders.gti_loader import GTILoader, GTISQLiteLoader
+    from loaders.generic import GenericMergeLoader
+    from pipeline import Pipeline
+
+    pipeline = Pipeline(
+        async_extraction=args.async_extraction,
+        memory_handoff=args.memory_handoff or args.shared_memory,
+        shared_memory=args.shared_memory,
+    )
+    loaders = [UnctadStatLoader(), GTILoader(), GenericMergeLoader()]
+    if args.sqlite:
+        loaders += [GTISQLiteLoader(), UnctadStatSQLiteLoader()]
+    pipeline.add(
+        extractors=[
+            GTIExtractor(
+                upload=GTI_UPLOAD,
+                start=2011,
+                end=2011 + args.gti_years - 1,
+                root_url=f"{server.url}/gti",
+            ),
+            UnctadStatExtractor(
+                variables=unctad_variables(args.variables),
+                base_url=f"{server.url}/unctad/",
+            ),
+        ],
+        transformers=[GTITransformer(), UnctadStatTransformer()],
+        loaders=loaders,
+    )
+    return pipeline
+
+
+def stage_results(report):
+    """Wall/cpu time, peak memory and throughput of every stage of a run"""
+    results = dict()
+    for process in report.processes:
+        stage = STAGES.get(process["process"])
+        if stage is None:
+            continue
+        metrics = process["metrics"]
+        objects = [obj["metrics"] for obj in process["objects"]]
+        results[stage] = {
+            "wall_time": metrics["wall_time"],
+            "cpu_time": metrics["cpu_time"],
+            "peak_rss_growth": metrics["peak_rss_growth"],
+            "rows": sum(obj.get("rows_processed", 0) for obj in objects),
+            "bytes": sum(
+                obj.get("bytes_downloaded") or obj.get("bytes_read") or 0
+                for obj in objects
+            ),
+        }
+    return results
+
+
+def summarize(runs):
+    """Median times over the runs, throughput computed from the median"""
+    stages = dict()
+    for stage in STAGES.values():
+        samples = [run[stage] for run in runs if stage in run]
+        if not samples:
+            continue
+        wall_time = statistics.median(s["wall_time"] for s in samples)
+        summary = {
+            "wall_time": round(wall_time, 3),
+            "cpu_time": round(statistics.median(s["cpu_time"] for s in samples), 3),
+            "peak_rss_growth": max(s["peak_rss_growth"] for s in samples),
+            "rows": samples[0]["rows"],
+            "bytes": samples[0]["bytes"],
+        }
+        if wall_time > 0:
+            summary["rows_per_second"] = round(summary["rows"] / wall_time)
+            summary["bytes_per_second"] = round(summary["bytes"] / wall_time)
+        stages[stage] = summary
+    total = round(sum(s["wall_time"] for s in stages.values()), 3)
+    return stages, total
+
+
+def compare(result, baseline, tolerance, min_delta):
+    """Prints the change per stage and returns the stages that regressed"""
+    if result["scale"] != baseline.get("scale"):
+        print("warning: baseline was recorded at a different scale")
+    regressions = []
+    print(f"\n{'stage':<16}{'baseline (s)':>14}{'current (s)':>14}{'change':>10}")
+    for stage, metrics in result["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if base is None or not base["wall_time"]:
+            continue
+        delta = metrics["wall_time"] - base["wall_time"]
+        change = delta / base["wall_time"]
+        flag = ""
+        if change > tolerance and delta > min_delta:
+            regressions.append(stage)
+            flag = "  REGRESSION"
+        print(
+            f"{stage:<16}{base['wall_time']:>14.3f}{metrics['wall_time']:>14.3f}"
+            f"{change:>+10.1%}{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--gti-years", type=int, default=13)
+    parser.add_argument("--countries", type=int, default=200)
+    parser.add_argument("--variables", type=int, default=10)
+    parser.add_argument("--unctad-years", type=int, default=30)
+    parser.add_argument("--categories", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--async-extraction", action="store_true")
+    parser.add_argument(
+        "--memory-handoff",
+        action="store_true",
+        help="hand transformed frames to the loaders in memory",
+    )
+    parser.add_argument(
+        "--shared-memory",
+        action="store_true",
+        help="hand transformed frames over in shared memory (implies --memory-handoff)",
+    )
+    parser.add_argument("--sqlite", action="store_true", help="add the SQLite loaders")
+    parser.add_argument("--output", type=Path, help="save the result as JSON")
+    parser.add_argument("--compare", type=Path, help="baseline result to compare to")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--min-delta", type=float, default=0.05)
+    args = parser.parse_args()
+    output = args.output.resolve() if args.output else None
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+
+    scale = {
+        "gti_years": args.gti_years,
+        "countries": args.countries,
+        "variables": args.variables,
+        "unctad_years": args.unctad_years,
+        "categories": args.categories,
+        "sqlite": args.sqlite,
+        "memory_handoff": args.memory_handoff,
+        "shared_memory": args.shared_memory,
+    }
+    cwd = os.getcwd()
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        fixtures = write_fixtures(
+            workdir / "fixtures",
+            args.gti_years,
+            args.countries,
+            args.variables,
+            args.unctad_years,
+            args.categories,
+        )
+        prepare_workdir(workdir)
+        try:
+            with MockSourceServer(fixtures) as server:
+                for _ in range(args.repeat):
+                    shutil.rmtree(workdir / "data", ignore_errors=True)
+                    pipeline = build_pipeline(args, server)
+                    runs.append(stage_results(pipeline.run()))
+        finally:
+            os.chdir(cwd)
+
+    stages, total = summarize(runs)
+    result = {
+        "benchmark": "pipeline",
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+        "scale": scale,
+        "stages": stages,
+        "total_wall_time": total,
+    }
+
+    print(f"\n{'stage':<16}{'wall (s)':>10}{'cpu (s)':>10}{'rows/s':>12}{'MB/s':>10}")
+    for stage, metrics in stages.items():
+        mb_per_second = metrics.get("bytes_per_second", 0) / 1024 / 1024
+        print(
+            f"{stage:<16}{metrics['wall_time']:>10.3f}{metrics['cpu_time']:>10.3f}"
+            f"{metrics.get('rows_per_second', 0):>12}{mb_per_second:>10.2f}"
+        )
+    print(f"{'total':<16}{total:>10.3f}")
+
+    if output:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(result, indent=2))
+        print(f"\nresult saved to {output}")
+    if baseline is not None:
+        regressions = compare(result, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"\nregressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Local mock of the GTI and UNCTADstat sources serving generated fixtures
+
+Serves the files written by `benchmarks.fixtures.write_fixtures` on the
+paths the extractors request, through aiohttp's FileResponse so ETag,
+conditional and Range requests behave like a real static file server:
+
+    /gti/<upload>/02/GTI_<year>_<upload>.csv
+    /unctad/<variable>/<variable_file>      (the <variable_file>.7z archive)
+
+Faults are injected per file name with `inject`: the next requests of the
+file get an error status (with optional headers such as Retry-After) or a
+body cut off after a number of bytes. Every request is logged in `requests`
+as (name, headers) so tests can check the conditional and Range headers.
+
+The server runs its own event loop in a background thread.
+"""
+
+from collections import defaultdict, deque
+from pathlib import Path
+import threading
+import asyncio
+
+from aiohttp import web
+
+
+class MockSourceServer:
+
+    def __init__(self, root, host="127.0.0.1", port=0):
+        self.root = Path(root)
+        self.host = host
+        self.port = port
+        self.loop = None
+        self.runner = None
+        self.thread = None
+        self.faults = defaultdict(deque)
+        self.requests = []
+
+    def inject(self, name, status=None, headers=None, truncate=None, times=1):
+        """
+        Makes the next `times` requests of the file `name` fail, either with
+        `status` and `headers` or by closing the connection after `truncate`
+        bytes of the body
+        """
+        for _ in range(times):
+            self.faults[name].append((status, headers or dict(), truncate))
+
+    def application(self):
+        app = web.Application()
+        app.router.add_get("/gti/{upload}/02/{name}", self.gti)
+        app.router.add_get("/unctad/{variable}/{name}", self.unctad)
+        return app
+
+    async def gti(self, request):
+        name = request.match_info["name"]
+        return await self.file_response(request, name, self.root / "gti" / name)
+
+    async def unctad(self, request):
+        name = request.match_info["name"]
+        path = self.root / "unctad" / f"{name}.7z"
+        return await self.file_response(request, name, path)
+
+    async def file_response(self, request, name, path):
+        self.requests.append((name, dict(request.headers)))
+        if not path.is_file():
+            raise web.HTTPNotFound()
+        if self.faults[name]:
+            status, headers, truncate = self.faults[name].popleft()
+            if truncate is not None:
+                return await self.truncated_response(request, path, truncate)
+            return web.Response(status=status, headers=headers)
+        return web.FileResponse(path)
+
+    async def truncated_response(self, request, path, size):
+        """Sends the headers of the whole file but only `size` bytes of its body"""
+        stat = path.stat()
+        resp = web.StreamResponse(
+            headers={
+                # the validator FileResponse sends for the same file
+                "ETag": f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+                "Accept-Ranges": "bytes",
+            }
+        )
+        resp.content_length = stat.st_size
+        await resp.prepare(request)
+        with open(path, "rb") as f:
+            await resp.write(f.read(size))
+        # the client reads what was sent before the connection drops, like a
+        # download interrupted mid-stream
+        await asyncio.sleep(0.1)
+        request.transport.close()
+        return resp
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        self.runner = web.AppRunner(self.application(), access_log=None)
+        self.loop.run_until_complete(self.runner.setup())
+        site = web.TCPSite(self.runner, self.host, self.port)
+        self.loop.run_until_complete(site.start())
+        # the actual port when started on port 0
+        self.port = self.runner.addresses[0][1]
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop)
+        future.result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -1,10 +1,16 @@
 import aiofiles
 import pathlib
+import hashlib
+import json
+import glob
+import os
 import logging
 import asyncio
 import aiohttp
 import abc
 
+from extractors.policy import RequestPolicy, RetryableResponse
+from extractors.cache import DownloadCache
 from utils.io import IOMixin
 from report.components import Metric
 
@@ -28,28 +34,85 @@ class Link:
 
 class Download:
 
-    def __init__(self, name, content):
+    def __init__(self, name, content=None, path=None, size=0, url=None):
         self.name = name
         self.content = content
+        self.path = path
+        self.size = size
+        self.url = url
+        self.sha256 = None
+        self.etag = None
+        self.last_modified = None
+        # files produced by the download, tracked by the download cache
+        self.files = [path] if path else []
+        # set when the body matches the cached content hash
+        self.unchanged = False
 
     def __repr__(self):
         return f"Download(name = {self.name})"
 
 
+def hash_file(path, digest):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+
+def join_parts(sources, target, digest):
+    """Concatenates `sources` into `target`, hashing the bytes as they are copied"""
+    with open(target, "wb") as out:
+        for source in sources:
+            with open(source, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    out.write(chunk)
+                    digest.update(chunk)
+
+
 class BaseExtractor(abc.ABC, IOMixin):
 
     name = ""
     domain = ""
     default_save_dir = ""
+    default_cache_dir = "data/.cache"
+    chunk_size = 64 * 1024
+    # maximum number of concurrent connections opened to the source host
+    max_connections = None
+    # streamed files at least this large are fetched as parallel byte ranges
+    segment_threshold = 64 * 1024 * 1024
+    range_segments = 4
 
-    def __init__(self, save_dir=None, metric_class=Metric):
+    def __init__(
+        self,
+        save_dir=None,
+        metric_class=Metric,
+        stream=True,
+        use_cache=True,
+        cache_dir=None,
+        request_policy=None,
+    ):
         self.name = self.__class__.name or self.__class__.__name__
         self.logger = logging.getLogger(f"ETL.Extractor.{self.name}")
+        self.stream = stream
+        self.request_policy = request_policy or RequestPolicy()
+        self.request_retries = 0
+        self.failed_downloads = 0
         self.setup_save_dir(save_dir)
+        self.setup_cache(use_cache, cache_dir)
         self.setup_metric_component(metric_class)
         self.progress_bar = None
+        self.session = None
+        self.bytes_resumed = 0
         self.download_tasks = len([link for link in self.get_links()])
 
+    def setup_cache(self, use_cache, cache_dir):
+        self.cache = None
+        self.cache_hits = 0
+        self.bytes_saved = 0
+        self.unchanged_downloads = 0
+        if use_cache:
+            cache_dir = pathlib.Path(cache_dir or self.default_cache_dir)
+            self.cache = DownloadCache(cache_dir / f"{self.name}.json")
+
     def setup_metric_component(self, metric_cls):
         self.metric = metric_cls(self.name)
         self.metric.add(source=self.domain)
@@ -60,70 +123,443 @@ class BaseExtractor(abc.ABC, IOMixin):
         pass
 
     async def handle_request(self, session, link):
-        encoding = link.encoding
+        """
+        Sends the request for `link` following `request_policy`: transient
+        failures are retried with backoff and a link that keeps failing
+        returns None instead of cancelling its sibling downloads
+        """
+        policy = self.request_policy
+        for attempt in range(policy.retries + 1):
+            await policy.throttle(link.url)
+            try:
+                return await self.send_request(session, link)
+            except (RetryableResponse, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == policy.retries:
+                    self.logger.error(
+                        "Request Failed - %s after %d attempts : %r",
+                        link.url,
+                        attempt + 1,
+                        e,
+                    )
+                    break
+                delay = policy.delay(attempt, getattr(e, "retry_after", None))
+                self.request_retries += 1
+                self.logger.warning(
+                    "Request Error - %s : %r, retrying in %.2fs", link.url, e, delay
+                )
+                await asyncio.sleep(delay)
+            except Exception:
+                self.logger.exception(
+                    "Download Failed - %s from %s", link.name, link.url
+                )
+                break
+        self.failed_downloads += 1
+        return None
+
+    async def send_request(self, session, link):
         headers = link.headers
-        self.logger.info(f"Sending Request: {link.url}")
-        async with session.get(link.url, headers=headers) as resp:
+        if self.cache is not None:
+            headers = {**headers, **self.cache.conditional_headers(link.url)}
+        if self.stream:
+            headers = {**headers, **self.resume_headers(link)}
+        self.logger.info("Sending Request: %s", link.url)
+        async with session.get(
+            link.url, headers=headers, timeout=self.request_policy.timeout
+        ) as resp:
+            if resp.status == 304:
+                self.remove_parts(link)
+                return self.handle_not_modified(link)
+
+            if resp.status == 416:
+                self.remove_parts(link)
+                raise RetryableResponse(
+                    resp.status, reason="Partial download does not match the source"
+                )
+
+            self.request_policy.check(resp)
+
             if not resp.ok:
                 self.logger.error(
-                    f"Request Error -  Received {resp.status} : {link.url}"
+                    "Request Error -  Received %s : %s", resp.status, link.url
                 )
+                self.failed_downloads += 1
                 return None
 
             self.logger.info(
-                f"Response Received ({resp.status}) - {link.name} from {link.url}"
+                "Response Received (%s) - %s from %s", resp.status, link.name, link.url
             )
-            if link.is_json_content:
-                content = await resp.content.json()
+            if self.stream:
+                download = await self.stream_download(resp, link)
             else:
-                content = await resp.content.read()
-            self.logger.info(f"Decoding Download - {link.name}, format : {encoding}")
-            if link.encoding:
-                content = content.decode(encoding)
-            self.logger.info(f"Decoding Complete - {link.name}, format : {encoding}")
+                download = await self.read_download(resp, link)
+            download.etag = resp.headers.get("ETag")
+            download.last_modified = resp.headers.get("Last-Modified")
+            if self.progress_bar:
+                self.progress_bar.update(1)
+            return download
+
+    def handle_not_modified(self, link):
+        """The cached copy is current, nothing is written or unpacked"""
+        entry = self.cache.get(link.url) or dict()
+        self.cache_hits += 1
+        self.bytes_saved += entry.get("size", 0)
+        self.logger.info("Not Modified (304) - %s, using cached copy", link.name)
+        if self.progress_bar:
             self.progress_bar.update(1)
-            return Download(content=content, name=link.name)
+        return None
+
+    def check_unchanged(self, download):
+        if self.cache is None:
+            return False
+        if self.cache.is_unchanged(download.url, download.sha256):
+            self.unchanged_downloads += 1
+            download.unchanged = True
+            download.files = self.cache.get(download.url)["files"]
+            self.logger.info("Content Unchanged - %s, skipping write", download.name)
+        return download.unchanged
+
+    async def read_download(self, resp, link):
+        """Buffers the whole response body in memory"""
+        encoding = link.encoding
+        if link.is_json_content:
+            content = await resp.content.json()
+        else:
+            content = await resp.content.read()
+        sha256 = hashlib.sha256(content).hexdigest()
+        size = len(content)
+        self.logger.info("Decoding Download - %s, format : %s", link.name, encoding)
+        if link.encoding:
+            content = content.decode(encoding)
+        self.logger.info("Decoding Complete - %s, format : %s", link.name, encoding)
+        download = Download(content=content, name=link.name, url=link.url, size=size)
+        download.sha256 = sha256
+        self.check_unchanged(download)
+        return download
+
+    def stream_path(self, link):
+        return self.save_dir / link.name
+
+    def part_path(self, link, segment=None):
+        """
+        Where a streamed download is kept until it is complete. Partial files
+        live in a hidden folder next to the target so they are never listed
+        as extracted data
+        """
+        path = self.stream_path(link)
+        name = path.name + ".part"
+        if segment is not None:
+            name += f".{segment}"
+        return path.parent / ".partial" / name
+
+    def part_state_path(self, link):
+        return self.part_path(link).with_suffix(".json")
+
+    def load_part_state(self, link):
+        """Returns the validators saved for a partial download of `link`, if any"""
+        try:
+            with open(self.part_state_path(link)) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("url") != link.url or not state.get("validator"):
+            return None
+        return state
+
+    def save_part_state(self, link, resp, segments=None):
+        # a partial body can only be resumed when the server lets us check
+        # that the remote file has not changed, and is not content-encoded
+        validator = resp.headers.get("ETag") or resp.headers.get("Last-Modified")
+        if (
+            not validator
+            or resp.headers.get("Content-Encoding", "identity") != "identity"
+        ):
+            return
+        state = {
+            "url": link.url,
+            "validator": validator,
+            "size": resp.content_length,
+            "segments": segments,
+        }
+        with open(self.part_state_path(link), "w") as f:
+            json.dump(state, f)
+
+    def remove_parts(self, link):
+        part = self.part_path(link)
+        if not part.parent.is_dir():
+            return
+        for path in part.parent.glob(glob.escape(part.stem) + ".*"):
+            path.unlink(missing_ok=True)
+
+    def resume_headers(self, link):
+        """Range headers continuing a download left behind by an interrupted request"""
+        part = self.part_path(link)
+        state = self.load_part_state(link)
+        if state is None or state["segments"] or not part.is_file():
+            return dict()
+        offset = part.stat().st_size
+        if not offset:
+            return dict()
+        return {
+            "Range": f"bytes={offset}-",
+            "If-Range": state["validator"],
+            "Accept-Encoding": "identity",
+        }
+
+    def can_segment(self, resp):
+        return (
+            self.range_segments > 1
+            and resp.status == 200
+            and resp.headers.get("Accept-Ranges") == "bytes"
+            and resp.headers.get("Content-Encoding", "identity") == "identity"
+            and (resp.content_length or 0) >= self.segment_threshold
+            and bool(resp.headers.get("ETag") or resp.headers.get("Last-Modified"))
+        )
+
+    async def stream_download(self, resp, link):
+        """
+        Copies the response body to its target file chunk by chunk while
+        the request is in flight, so at most `chunk_size` bytes of the
+        download are held in memory. The body is written to a partial file
+        first, which a later attempt resumes with a Range request. The target
+        is only replaced when the content differs from the cached hash
+        """
+        path = self.stream_path(link)
+        part = self.part_path(link)
+        part.parent.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        self.logger.info("Streaming Download : %s to %s", link.name, path)
+        if self.can_segment(resp):
+            size = await self.download_segments(resp, link, digest)
+        else:
+            size = await self.download_part(resp, link, digest)
+        download = Download(name=link.name, path=path, size=size, url=link.url)
+        download.sha256 = digest.hexdigest()
+        if self.check_unchanged(download):
+            # the target keeps its content and modification time
+            self.remove_parts(link)
+            await self.discard_download(download)
+            return download
+        os.replace(part, path)
+        self.remove_parts(link)
+        await self.finalize_download(download)
+        self.logger.info("Write Operation Complete : %s to %s", link.name, path)
+        return download
+
+    async def download_part(self, resp, link, digest):
+        part = self.part_path(link)
+        offset = 0
+        mode = "wb"
+        if resp.status == 206:
+            offset = part.stat().st_size
+            if not resp.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+                self.remove_parts(link)
+                raise RetryableResponse(
+                    resp.status, reason="Unexpected Content-Range in response"
+                )
+            mode = "ab"
+            await asyncio.to_thread(hash_file, part, digest)
+            self.bytes_resumed += offset
+            self.logger.info("Resuming Download : %s from byte %d", link.name, offset)
+        else:
+            self.save_part_state(link, resp)
+        size = offset
+        async with aiofiles.open(part, mode) as f:
+            async for chunk in resp.content.iter_chunked(self.chunk_size):
+                await f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        return size
+
+    async def download_segments(self, resp, link, digest):
+        """
+        Fetches the body as `range_segments` concurrent byte ranges, each kept
+        in its own partial file so an interrupted segment resumes on its own
+        """
+        total = resp.content_length
+        validator = resp.headers.get("ETag") or resp.headers.get("Last-Modified")
+        state = self.load_part_state(link)
+        if state is None or (state["validator"], state["size"], state["segments"]) != (
+            validator,
+            total,
+            self.range_segments,
+        ):
+            self.remove_parts(link)
+            self.save_part_state(link, resp, segments=self.range_segments)
+        # only the headers of the first response were needed
+        resp.close()
+        step = -(-total // self.range_segments)
+        ranges = [
+            (start, min(start + step, total) - 1) for start in range(0, total, step)
+        ]
+        self.logger.info(
+            "Segmented Download : %s in %d ranges of %d bytes",
+            link.name,
+            len(ranges),
+            step,
+        )
+        results = await asyncio.gather(
+            *(
+                self.download_segment(link, i, start, end, validator)
+                for i, (start, end) in enumerate(ranges)
+            ),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        sources = [self.part_path(link, i) for i in range(len(ranges))]
+        await asyncio.to_thread(join_parts, sources, self.part_path(link), digest)
+        return total
+
+    async def download_segment(self, link, index, start, end, validator):
+        path = self.part_path(link, index)
+        offset = path.stat().st_size if path.is_file() else 0
+        if offset > end - start + 1:
+            path.unlink()
+            offset = 0
+        self.bytes_resumed += offset
+        if offset == end - start + 1:
+            return
+        headers = {
+            **link.headers,
+            "Range": f"bytes={start + offset}-{end}",
+            "If-Range": validator,
+            "Accept-Encoding": "identity",
+        }
+        await self.request_policy.throttle(link.url)
+        async with self.session.get(
+            link.url, headers=headers, timeout=self.request_policy.timeout
+        ) as resp:
+            self.request_policy.check(resp)
+            if resp.status != 206:
+                # the source changed since the download started
+                self.remove_parts(link)
+                raise RetryableResponse(
+                    resp.status, reason=f"Range request for {link.name} not honoured"
+                )
+            async with aiofiles.open(path, "ab") as f:
+                async for chunk in resp.content.iter_chunked(self.chunk_size):
+                    await f.write(chunk)
+
+    async def finalize_download(self, download):
+        """Hook for post-processing a streamed download, e.g unpacking archives"""
+        pass
+
+    async def discard_download(self, download):
+        """
+        Hook for cleaning up after a streamed download whose content is
+        unchanged. Its partial file is already removed and the target left as is
+        """
+        pass
 
-    async def start_request(self):
+    async def start_request(self, session=None):
+        if session is None:
+            async with aiohttp.ClientSession() as session:
+                return await self.start_request(session)
+
+        self.session = session
         download_tasks = set()
-        async with aiohttp.ClientSession() as session:
-            async with asyncio.TaskGroup() as tg:
-                for link in self.get_links():
-                    self.logger.info(
-                        f"Schedulling Request : {link.name} from {link.url}"
-                    )
-                    task = tg.create_task(self.handle_request(session, link))
-                    download_tasks.add(task)
+        limit = asyncio.Semaphore(self.max_connections or self.download_tasks or 1)
+        async with asyncio.TaskGroup() as tg:
+            for link in self.get_links():
+                self.logger.info(
+                    "Schedulling Request : %s from %s", link.name, link.url
+                )
+                task = tg.create_task(self.limited_request(session, link, limit))
+                download_tasks.add(task)
         return download_tasks
 
+    async def limited_request(self, session, link, limit):
+        async with limit:
+            return await self.handle_request(session, link)
+
     async def write(self):
         async with asyncio.TaskGroup() as tg:
             for download in self.downloads:
+                if download.unchanged:
+                    continue
                 self.logger.info(
-                    f"Schedulling Write Operation: {download.name} to folder {self.save_dir}"
+                    "Schedulling Write Operation: %s to folder %s",
+                    download.name,
+                    self.save_dir,
                 )
                 tg.create_task(self.write_download(download))
 
     async def write_download(self, download):
         path = self.save_dir / download.name
-        self.logger.info(f"Initializing Write Operation : {download.name} to {path}")
+        download.files = [path]
+        self.logger.info("Initializing Write Operation : %s to %s", download.name, path)
         async with aiofiles.open(path, "w") as f:
             await f.write(download.content)
-            self.logger.info(f"Write Operation Complete : {download.name} to {path}")
+            self.logger.info("Write Operation Complete : %s to %s", download.name, path)
 
-    def extract(self, pbar=None):
+    def collect_downloads(self, download_tasks):
         downloads = []
-        if pbar:
-            self.progress_bar = pbar
-        for task in asyncio.run(self.start_request()):
+        for task in download_tasks:
             result = task.result()
             if result:
                 downloads.append(result)
         self.metric.add(number_of_files_downloaded=len(downloads))
-        self.downloads = downloads
-        asyncio.run(self.write())
+        self.metric.add(request_retries=self.request_retries)
+        self.metric.add(failed_downloads=self.failed_downloads)
+        self.metric.add(bytes_downloaded=sum(d.size for d in downloads))
+        self.metric.add(bytes_resumed=self.bytes_resumed)
+        return downloads
+
+    def update_cache(self, downloads):
+        if self.cache is None:
+            return
+        for download in downloads:
+            self.cache.update(
+                download.url,
+                etag=download.etag,
+                last_modified=download.last_modified,
+                sha256=download.sha256,
+                size=download.size,
+                files=download.files,
+            )
+        self.cache.save()
+        self.metric.add(cache_hits=self.cache_hits)
+        self.metric.add(bytes_saved=self.bytes_saved)
+        self.metric.add(unchanged_downloads=self.unchanged_downloads)
+
+    def extract(self, pbar=None):
+        if pbar:
+            self.progress_bar = pbar
+        with self.metric.measure():
+            try:
+                downloads = self.collect_downloads(asyncio.run(self.start_request()))
+                if not self.stream:
+                    self.downloads = downloads
+                    asyncio.run(self.write())
+                self.update_cache(downloads)
+            finally:
+                self.close()
         return self.metric
 
+    async def extract_async(self, session, pbar=None):
+        """
+        Runs the extraction on the caller's event loop using a shared session,
+        letting several extractors reuse the same connection pool
+        """
+        if pbar:
+            self.progress_bar = pbar
+        # the event loop thread is shared with the other extractors
+        with self.metric.measure(thread_cpu=False):
+            try:
+                downloads = self.collect_downloads(await self.start_request(session))
+                if not self.stream:
+                    self.downloads = downloads
+                    await self.write()
+                self.update_cache(downloads)
+            finally:
+                self.close()
+        return self.metric
+
+    def close(self):
+        """Hook for releasing resources held for the extraction"""
+        pass
+
     def __repr__(self):
         return f"{self.__class__.__name__}<{self.save_dir or self.domain}>"
 
@@ -0,0 +1,69 @@
+"""
+On-disk download cache used by extractors to send conditional requests
+
+Entries are keyed by `Link.url` and keep the validators returned by the
+server (ETag / Last-Modified), a sha256 of the downloaded body and the
+files the download produced, so an unchanged source can be skipped.
+"""
+
+from pathlib import Path
+import json
+import os
+
+
+class DownloadCache:
+
+    def __init__(self, path):
+        self.path = path if isinstance(path, Path) else Path(path)
+        self.entries = dict()
+        self.load()
+
+    def load(self):
+        if not self.path.is_file():
+            return
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            # a corrupt cache only costs a full download
+            self.entries = dict()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def get(self, url):
+        """Returns the entry for `url` if every file it produced is still on disk"""
+        entry = self.entries.get(url)
+        if entry is None:
+            return None
+        if not all(Path(fn).is_file() for fn in entry.get("files", [])):
+            return None
+        return entry
+
+    def conditional_headers(self, url):
+        entry = self.get(url)
+        headers = dict()
+        if entry is None:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def is_unchanged(self, url, sha256):
+        entry = self.get(url)
+        return entry is not None and entry.get("sha256") == sha256
+
+    def update(self, url, etag=None, last_modified=None, sha256=None, size=0, files=()):
+        self.entries[url] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "sha256": sha256,
+            "size": size,
+            "files": [str(fn) for fn in files],
+        }
@@ -29,14 +29,23 @@ class GTIExtractor(BaseExtractor):
     name = "vision_of_humanity"
     default_save_dir = "data/gti/extracted"
     domain = "www.visionofhumanity.org"
+    max_connections = 4
 
-    def __init__(self, upload=None, start=None, end=None, save_dir=None):
+    def __init__(
+        self,
+        upload=None,
+        start=None,
+        end=None,
+        save_dir=None,
+        root_url=None,
+        **kwargs,
+    ):
         self.upload = upload or UPLOAD_YEAR
         self.start = start or START_YEAR
         self.end = end or END_YEAR
-        self._root_url = ROOT_URL
+        self._root_url = root_url or ROOT_URL
         self._base_url = f"{self.root_url}/{self.upload}/02/"
-        super().__init__(save_dir)
+        super().__init__(save_dir, **kwargs)
 
     def setup_metric_component(self, metric_class):
         super().setup_metric_component(metric_class)
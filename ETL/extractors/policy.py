@@ -0,0 +1,112 @@
+"""
+Request policy used by extractors: retries with jittered exponential backoff,
+timeouts, Retry-After handling and a token bucket rate limit per host
+"""
+
+from urllib.parse import urlsplit
+import email.utils
+import datetime as dt
+import asyncio
+import random
+import time
+
+import aiohttp
+
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class RetryableResponse(Exception):
+
+    def __init__(self, status, retry_after=None, reason=None):
+        super().__init__(reason or f"Received retryable status {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second with bursts of up to `capacity`.
+    Only used from a single event loop, so no locking is needed
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RequestPolicy:
+
+    def __init__(
+        self,
+        retries=3,
+        backoff=0.5,
+        max_backoff=30.0,
+        connect_timeout=30.0,
+        read_timeout=60.0,
+        rate=None,
+        burst=None,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # no total timeout, bulk downloads may legitimately take long
+        self.timeout = aiohttp.ClientTimeout(
+            total=None, sock_connect=connect_timeout, sock_read=read_timeout
+        )
+        self.rate = rate
+        self.burst = burst
+        self.buckets = dict()
+
+    async def throttle(self, url):
+        """Waits for a token of the url's host when a rate limit is set"""
+        if not self.rate:
+            return
+        host = urlsplit(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+        await self.buckets[host].acquire()
+
+    def check(self, resp):
+        if resp.status in RETRY_STATUSES:
+            retry_after = self.parse_retry_after(resp.headers.get("Retry-After"))
+            raise RetryableResponse(resp.status, retry_after)
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait before retry number `attempt` (starting at 0)"""
+        if retry_after is not None:
+            # a server asking for hours must not stall the whole run
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    @staticmethod
+    def parse_retry_after(value):
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        # an HTTP-date that cannot be parsed counts as a missing header
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return None
+        if date.tzinfo is None:
+            # HTTP-dates are in GMT
+            date = date.replace(tzinfo=dt.timezone.utc)
+        now = dt.datetime.now(tz=dt.timezone.utc)
+        return max(0.0, (date - now).total_seconds())
@@ -5,8 +5,15 @@ Extractor for https://unctadstat.unctad.org
 from extractors.base import BaseExtractor
 from extractors.base import Link
 from pathlib import Path
+import concurrent.futures
+import multiprocessing
+import functools
+import asyncio
 import py7zr
-import aiofiles
+import time
+import io
+
+from report.components import timed
 
 """
 The main idea is that the extractor takes in url(s) as input and downloads the data
@@ -33,22 +40,43 @@ HEADERS = {
 }
 
 
+def unpack_archive(source, path):
+    """
+    Unpacks a 7z archive given as bytes (read from memory) or as a file path
+    into `path` and returns the names of the unpacked files.
+    Runs in a worker process so decompression never blocks the event loop
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    with py7zr.SevenZipFile(source, mode="r") as archive:
+        names = archive.getnames()
+        archive.extractall(path=path)
+    return names
+
+
 class UnctadStatExtractor(BaseExtractor):
     name = "unctadstat"
     domain = "https://unctadstat.unctad.org"
     default_save_dir = "data/unctadstat/extracted"
+    base_url = "https://unctadstat-api.unctad.org/bulkdownload/"
+    # bulk archives are large, keep the load on unctadstat-api low
+    max_connections = 2
+    # archives up to this size are unpacked from memory without a temp file
+    in_memory_limit = 64 * 1024 * 1024
+    unpack_workers = None
 
-    def __init__(self, variables, save_dir=None):
+    def __init__(self, variables, save_dir=None, base_url=None, **kwargs):
         self.variables = variables
-        super().__init__(save_dir)
+        self.base_url = base_url or self.base_url
+        super().__init__(save_dir, **kwargs)
         temp_dir = Path(f"{self.save_dir}/uncstat_temp/")
         if not temp_dir.is_dir():
             temp_dir.mkdir()
         self.temp_dir = temp_dir
+        self.unpack_executor = None
 
     def construct_download_link(self, variable_name):
-        base_url = "https://unctadstat-api.unctad.org/bulkdownload/"
-        url = base_url + f"{variable_name}/" + variable_name.replace(".", "_", 1)
+        url = self.base_url + f"{variable_name}/" + variable_name.replace(".", "_", 1)
         link = Link(
             url=url,
             name=variable_name.replace(".", "_") + ".csv",
@@ -65,19 +93,55 @@ class UnctadStatExtractor(BaseExtractor):
     def parse(self, content):
         return content
 
+    def stream_path(self, link):
+        # large archives are streamed to the temp folder and unpacked from there
+        return self.temp_dir / link.name
+
+    async def unpack(self, download, source):
+        """Unpacks `source` in the process pool while other downloads carry on"""
+        if self.unpack_executor is None:
+            # started from an extractor or event loop thread, forking the
+            # multithreaded process is unsafe
+            self.unpack_executor = concurrent.futures.ProcessPoolExecutor(
+                self.unpack_workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        path = self.save_dir
+        loop = asyncio.get_running_loop()
+        unpack = functools.partial(timed, time.process_time, unpack_archive)
+        names, cpu_time = await loop.run_in_executor(
+            self.unpack_executor, unpack, source, str(path)
+        )
+        self.metric.add_worker_cpu_time(cpu_time)
+        download.files = [path / name for name in names]
+        self.logger.info("Unpacked Archive : %s to %s", download.name, path)
+
+    async def stream_download(self, resp, link):
+        size = resp.content_length
+        # resumed downloads continue their partial file on disk
+        if resp.status == 206 or size is None or size > self.in_memory_limit:
+            return await super().stream_download(resp, link)
+        # small enough to unpack straight from memory, skipping the temp file
+        download = await self.read_download(resp, link)
+        if not download.unchanged:
+            await self.unpack(download, download.content)
+        download.content = None
+        return download
+
+    async def finalize_download(self, download):
+        await self.unpack(download, str(download.path))
+        download.path.unlink()
+
     async def write_download(self, download):
         path = self.save_dir
-        self.logger.info(f"Initializing Write Operation : {download.name} to {path}")
-        temp_path = self.temp_dir / download.name
-
-        async with aiofiles.open(temp_path, "wb") as f:
-            await f.write(download.content)
-            # move unzipped file to path
-            archive = py7zr.SevenZipFile(temp_path, mode="r")
-            archive.extractall(path=path)
-            archive.close()
-            temp_path.unlink()
-            self.logger.info(f"Write Operation Complete : {download.name} to {path}")
+        self.logger.info("Initializing Write Operation : %s to %s", download.name, path)
+        await self.unpack(download, download.content)
+        self.logger.info("Write Operation Complete : %s to %s", download.name, path)
+
+    def close(self):
+        if self.unpack_executor is not None:
+            self.unpack_executor.shutdown()
+            self.unpack_executor = None
 
     def run(self):
         super().run()
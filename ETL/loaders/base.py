@@ -1,5 +1,6 @@
 from pathlib import Path
 import logging
+import time
 import abc
 
 from utils.io import IOMixin
@@ -12,13 +13,25 @@ class BaseLoaderClass(abc.ABC, IOMixin):
     name = ""
     default_data_dir = ""
     default_save_dir = ""
+    # loaders that build their output incrementally get the datasets as a
+    # lazy iterator instead of a list, see `stream`
+    lazy = False
 
     def __init__(
-        self, data_dir=None, save_dir=None, save_file_type="excel", metric_class=Metric
+        self,
+        data_dir=None,
+        save_dir=None,
+        save_file_type="excel_fast",
+        metric_class=Metric,
+        fetch_workers=None,
+        lazy=None,
     ):
         self.name = self.__class__.name or self.__class__.__name__
         self.logger = logging.getLogger(f"ETL.Loader.{self.name}")
         self.save_file_type = save_file_type
+        self.fetch_workers = fetch_workers
+        self.lazy = self.lazy if lazy is None else lazy
+        self.written_files = []
         self.setup_directories(data_dir, save_dir)
         self.setup_metric_component(metric_class)
 
@@ -32,7 +45,64 @@ class BaseLoaderClass(abc.ABC, IOMixin):
     def load(self, dataset):
         pass
 
-    def load_data(self):
-        dataset = self.fetch()
-        self.load(dataset)
+    def write(self, name, data):
+        filename = super().write(name, data)
+        self.written_files.append(filename)
+        return filename
+
+    def stream(self, files):
+        """
+        Yields the datasets of `files` one at a time, recording the time spent
+        reading and the rows read once the iterator is exhausted or closed
+        """
+        read_time = rows = 0
+        datasets = self.iter_fetch(files)
+        try:
+            while True:
+                start = time.perf_counter()
+                data = next(datasets, None)
+                read_time += time.perf_counter() - start
+                if data is None:
+                    break
+                rows += len(data)
+                yield data
+        finally:
+            self.metric.add(read_time=round(read_time, 3))
+            self.metric.add(rows_processed=rows)
+
+    def load_data(self, manifest=None, store=None):
+        """
+        Fetches the data and runs the load method, handing it a list of
+        datasets or, for lazy loaders, an iterator reading them one at a time.
+        When a `manifest` is given the load is skipped if none of the input
+        files changed since the last recorded run. Frames the transformers
+        handed to `store` (a FrameStore) are read from memory
+        """
+        self.frame_store = store
+        with self.metric.measure():
+            files = self.list_files()
+            if manifest is not None and manifest.is_current(self, files):
+                self.logger.info("Incremental run: inputs unchanged, skipping load")
+                self.metric.add(skipped=True)
+                return self.metric
+
+            self.metric.add(fetch_workers=self.fetch_worker_count(len(files)))
+            self.metric.add(bytes_read=sum(self.input_size(fn) for fn in files))
+            if store is not None:
+                self.metric.add(frames_from_memory=sum(fn in store for fn in files))
+            if self.lazy:
+                self.load(self.stream(files))
+            else:
+                start = time.perf_counter()
+                dataset = self.fetch(files)
+                self.metric.add(read_time=round(time.perf_counter() - start, 3))
+                self.metric.add(rows_processed=sum(len(data) for data in dataset))
+                self.load(dataset)
+            self.metric.add(
+                bytes_written=sum(fn.stat().st_size for fn in self.written_files)
+            )
+            if manifest is not None:
+                # inputs are fingerprinted after the load since a loader may write
+                # into its own data directory
+                manifest.record(self, self.list_files(), self.written_files)
         return self.metric
@@ -3,6 +3,7 @@ Merge dataset and write to excel
 """
 
 from loaders.base import BaseLoaderClass
+from utils.countries import registry
 
 from functools import reduce
 from pathlib import Path
@@ -15,19 +16,51 @@ class GenericMergeLoader(BaseLoaderClass):
     default_data_dir = Path("data/loaded")
     default_save_dir = Path("data/loaded")
 
+    merge_keys = ["Country Name", "year"]
+
+    def merge_pairwise(self, dataset):
+        """Outer merges the frames two at a time"""
+        return reduce(
+            lambda left, right: pd.merge(left, right, on=self.merge_keys, how="outer"),
+            dataset,
+        ).sort_values(by=self.merge_keys)
+
+    def can_merge_indexed(self, dataset):
+        """
+        A single aligned join gives the same result as the pairwise merge
+        when the keys are unique in every frame and no other column is shared
+        """
+        seen = set()
+        for data in dataset:
+            columns = set(data.columns) - set(self.merge_keys)
+            if columns & seen or data.duplicated(subset=self.merge_keys).any():
+                return False
+            seen |= columns
+        return True
+
+    def merge_indexed(self, dataset):
+        """
+        Indexes every frame on the merge keys once and aligns them all in a
+        single outer concat, instead of building N-1 growing intermediates
+        """
+        columns = list(dict.fromkeys(c for data in dataset for c in data.columns))
+        frames = [data.set_index(self.merge_keys) for data in dataset]
+        merged_data = pd.concat(frames, axis=1, join="outer").sort_index()
+        return merged_data.reset_index()[columns]
+
     def load(self, dataset):
+        # the merge needs every frame, lazy datasets are read in full first
+        dataset = list(dataset)
         len_read_files = len(dataset)
         self.metric.add(number_of_files_read=len_read_files)
-        if len_read_files > 1:
-            merged_data = reduce(
-                lambda left, right: pd.merge(
-                    left, right, on=["Country Name", "year"], how="outer"
-                ),
-                dataset,
-            ).sort_values(by=["Country Name", "year"])
-
+        # merge on shared categorical codes instead of country name strings
+        dataset = registry.encode_frames(dataset)
+        if len_read_files > 1 and self.can_merge_indexed(dataset):
+            merged_data = self.merge_indexed(dataset)
+        elif len_read_files > 1:
+            merged_data = self.merge_pairwise(dataset)
         else:
-            merged_data = dataset[0].sort_values(by=["Country Name", "year"])
+            merged_data = dataset[0].sort_values(by=self.merge_keys)
 
         self.write("gti", merged_data)
         self.metric.add(number_of_written_files=1)
@@ -1,5 +1,7 @@
 from loaders.base import BaseLoaderClass
-import pandas as pd
+from loaders.sqlite import SQLiteLoader
+from utils.countries import registry
+from utils.io import StreamingConcat
 
 
 class GTILoader(BaseLoaderClass):
@@ -8,16 +10,27 @@ class GTILoader(BaseLoaderClass):
     default_data_dir = "data/gti/transformed"
     default_save_dir = "data/loaded"
 
+    lazy = True
+
     def load(self, dataset):
-        len_read_files = len(dataset)
-        self.metric.add(number_of_files_read=len_read_files)
-        if len_read_files > 1:
-            merged_data = pd.concat(dataset)
-        else:
-            merged_data = dataset[0]
+        # years are appended as they are read, only the concatenated output
+        # is held in memory
+        merged = StreamingConcat()
+        for data in dataset:
+            merged.append(registry.encode_frames([data])[0])
+        self.metric.add(number_of_files_read=len(merged))
+        # shared categories keep the country column categorical through concat
+        merged_data = registry.encode_frames([merged.result()])[0]
 
         merged_data = merged_data.sort_values(by=["Country Name", "year"])
 
         self.write("gti", merged_data)
         self.metric.add(operations=["merge", "sorting"])
         self.metric.add(number_of_files_written=1)
+
+
+class GTISQLiteLoader(SQLiteLoader):
+
+    name = "GTI SQLite Loader"
+    default_data_dir = "data/gti/transformed"
+    variable_prefix = "gti"
@@ -0,0 +1,160 @@
+"""
+Load transformed data into an embedded SQLite database
+
+Every numeric column is stored in a single long table keyed on
+(country, year, variable), so new sources or variables never change the
+schema. Rows are bulk upserted in one transaction and a row is only
+rewritten when its value changed, so an incremental load touches just the
+rows that differ. Consumers query by country, year range or variable
+through the indexes instead of parsing a whole workbook:
+
+    from loaders.sqlite import query
+    query("data/database/etl.sqlite", country="Nigeria", start=2015, end=2020)
+"""
+
+from loaders.base import BaseLoaderClass
+from report.components import Metric
+
+from contextlib import closing
+from pathlib import Path
+import sqlite3
+
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    country TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    variable TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (country, year, variable)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS observations_year ON observations (year);
+CREATE INDEX IF NOT EXISTS observations_variable_year ON observations (variable, year);
+"""
+
+UPSERT = """
+INSERT INTO observations (country, year, variable, value) VALUES (?, ?, ?, ?)
+ON CONFLICT (country, year, variable) DO UPDATE SET value = excluded.value
+WHERE value IS NOT excluded.value
+"""
+
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def query(path, country=None, start=None, end=None, variables=None):
+    """
+    Returns the observations matching the filters as a long dataframe with
+    the columns country, year, variable and value
+    """
+    clauses, params = [], []
+    if country is not None:
+        clauses.append("country = ?")
+        params.append(country)
+    if start is not None:
+        clauses.append("year >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("year <= ?")
+        params.append(end)
+    if variables:
+        variables = [variables] if isinstance(variables, str) else list(variables)
+        clauses.append(f"variable IN ({', '.join('?' * len(variables))})")
+        params.extend(variables)
+    sql = "SELECT country, year, variable, value FROM observations"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY country, year, variable"
+    with closing(sqlite3.connect(path)) as connection:
+        return pd.read_sql_query(sql, connection, params=params)
+
+
+class SQLiteLoader(BaseLoaderClass):
+
+    name = "SQLite Loader"
+    default_save_dir = Path("data/database")
+    database = "etl.sqlite"
+
+    country_column = "Country Name"
+    year_column = "year"
+    # non-numeric columns that qualify a variable, e.g unctadstat categories
+    dimensions = ["category"]
+    # prefix of the variable names, the data file name when not set
+    variable_prefix = None
+    # every dataset is upserted as it is read
+    lazy = True
+
+    def __init__(self, data_dir=None, save_dir=None, metric_class=Metric, **kwargs):
+        super().__init__(data_dir, save_dir, "sqlite", metric_class, **kwargs)
+        self.path = self.save_dir / self.database
+
+    def fingerprint_config(self):
+        config = super().fingerprint_config()
+        config["database"] = str(self.path)
+        return config
+
+    def read(self, fn, **options):
+        data = super().read(fn, **options)
+        data.attrs["source"] = fn.name.lower().split(".")[0]
+        return data
+
+    def records(self, data):
+        """Yields (country, year, variable, value) for every numeric cell of `data`"""
+        keys = [self.country_column, self.year_column]
+        prefix = self.variable_prefix or data.attrs.get("source", self.name)
+        dimensions = [c for c in self.dimensions if c in data.columns]
+        values = [
+            c
+            for c in data.columns
+            if c not in keys
+            and c not in dimensions
+            and pd.api.types.is_numeric_dtype(data[c])
+        ]
+        countries = data[self.country_column].astype(str).tolist()
+        years = data[self.year_column].astype(int).tolist()
+        qualifiers = pd.Series("", index=data.index)
+        for dimension in dimensions:
+            qualifiers = qualifiers + "|" + data[dimension].astype(str)
+        qualifiers = qualifiers.tolist()
+        for column in values:
+            column_values = data[column].astype(float).tolist()
+            variable = f"{prefix}.{column}"
+            for country, year, qualifier, value in zip(
+                countries, years, qualifiers, column_values
+            ):
+                # NaN is stored as NULL
+                value = None if value != value else value
+                yield country, year, variable + qualifier, value
+
+    def load(self, dataset):
+        files = rows = skipped = 0
+        with closing(connect(self.path)) as connection, connection:
+            connection.executescript(SCHEMA)
+            before = connection.total_changes
+            for data in dataset:
+                files += 1
+                # rows without a country or year (e.g blank unctadstat
+                # periods) have no key to be stored under
+                keyed = data.dropna(subset=[self.country_column, self.year_column])
+                skipped += len(data) - len(keyed)
+                records = list(self.records(keyed))
+                connection.executemany(UPSERT, records)
+                rows += len(records)
+            changed = connection.total_changes - before
+        self.metric.add(number_of_files_read=files)
+        self.logger.info(f"Upserted {changed} of {rows} rows into {self.path}")
+        self.written_files.append(self.path)
+        self.metric.add(rows_upserted=changed)
+        self.metric.add(rows_unchanged=rows - changed)
+        self.metric.add(rows_skipped=skipped)
+        if skipped:
+            self.logger.warning(f"Skipped {skipped} rows without a country or year")
+        self.metric.add(operations=["melt", "upsert"])
+
+    def query(self, country=None, start=None, end=None, variables=None):
+        return query(self.path, country, start, end, variables)
@@ -1,4 +1,5 @@
 from loaders.generic import GenericMergeLoader
+from loaders.sqlite import SQLiteLoader
 
 
 class UnctadStatLoader(GenericMergeLoader):
@@ -6,3 +7,9 @@ class UnctadStatLoader(GenericMergeLoader):
     name = "UnctadStat Loader"
     default_data_dir = "data/unctadstat/transformed"
     default_save_dir = "data/loaded"
+
+
+class UnctadStatSQLiteLoader(SQLiteLoader):
+
+    name = "UnctadStat SQLite Loader"
+    default_data_dir = "data/unctadstat/transformed"
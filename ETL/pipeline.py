@@ -2,24 +2,65 @@
 Include logic for pipeline
 
 # pipeline a way of running things in order
-    - extractors : asynchronous in multiple threads 
-    - transformers : mulitprocesse per transformer
+    - extractors : asynchronous in multiple threads, or all on a single
+                   event loop sharing one connection pool (async_extraction)
+    - transformers : file level tasks submitted to one process pool that
+                     is kept warm for every transformer of the run
     - loaders : single process 
+
+# scheduled runs (run(scheduled=True))
+    - components start as soon as the components producing their input
+      directories finish, independent chains run concurrently
+
+# in-memory handoff (memory_handoff=True)
+    - transformed frames go straight to the loaders through a FrameStore,
+      the intermediates are only written with persist_intermediates=True
+      (always for incremental runs, see utils.store). With shared_memory=True
+      the transformer workers hand them over in shared memory (utils.shm)
+
+# incremental runs
+    - extractors skip unchanged sources through their download cache
+    - transformers only process files whose inputs changed and loaders are
+      skipped when none of their inputs changed (see utils.manifest)
 """
 
 import concurrent.futures
+import functools
 import logging.config
+import asyncio
+import aiohttp
 import config
 import atexit
 import tqdm
 
-from report.components import ProcessMetricFactory, Report
+from report.components import Metric, ProcessMetricFactory, Report
+from scheduler import DAGScheduler
+from utils.manifest import Manifest
+from utils.store import FrameStore
+from utils.workers import WorkerPool
 
 
 class Pipeline:
 
-    def __init__(self):
+    def __init__(
+        self,
+        async_extraction=False,
+        limit_per_host=8,
+        incremental=False,
+        manifest_path=None,
+        transform_workers=None,
+        memory_handoff=False,
+        persist_intermediates=False,
+        shared_memory=False,
+    ):
         # self.logger = logging.getLogger("ETL.Pipeline")
+        self.async_extraction = async_extraction
+        self.limit_per_host = limit_per_host
+        self.manifest = Manifest(manifest_path) if incremental else None
+        self.transform_workers = transform_workers
+        # incremental runs compare the intermediates on disk
+        persist = persist_intermediates or incremental
+        self.store = FrameStore(persist, shared_memory) if memory_handoff else None
         self.extractors = []
         self.transformers = []
         self.loaders = []
@@ -84,43 +125,139 @@ class Pipeline:
         return outline_str
 
     def run_extractors(self):
+        if self.async_extraction:
+            return asyncio.run(self.run_extractors_async())
+
         extraction_metric = self.process_metric_factory("Extraction")
         total = sum(extractor.download_tasks for extractor in self.extractors)
-        with tqdm.tqdm(total=total, desc="Extraction") as pbar:
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                futures = [
-                    executor.submit(extractor.extract, pbar)
-                    for extractor in self.extractors
-                ]
+        with extraction_metric.measure():
+            with tqdm.tqdm(total=total, desc="Extraction") as pbar:
+                with concurrent.futures.ThreadPoolExecutor() as executor:
+                    futures = [
+                        executor.submit(extractor.extract, pbar)
+                        for extractor in self.extractors
+                    ]
+
+                    for future in concurrent.futures.as_completed(futures):
+                        extraction_metric.add(future.result().emit())
+                        pbar.update(1)
 
-                for future in concurrent.futures.as_completed(futures):
-                    extraction_metric.add(future.result().emit())
-                    pbar.update(1)
+        self.report.add_process_metric(extraction_metric.emit())
 
+    async def run_extractors_async(self):
+        """
+        Schedules every extractor on one event loop through a single pooled
+        session, so connections are kept alive and reused across extractors
+        """
+        extraction_metric = self.process_metric_factory("Extraction")
+        total = sum(extractor.download_tasks for extractor in self.extractors)
+        connector = aiohttp.TCPConnector(limit_per_host=self.limit_per_host)
+        with extraction_metric.measure():
+            with tqdm.tqdm(total=total, desc="Extraction") as pbar:
+                async with aiohttp.ClientSession(connector=connector) as session:
+                    async with asyncio.TaskGroup() as tg:
+                        tasks = [
+                            tg.create_task(extractor.extract_async(session, pbar))
+                            for extractor in self.extractors
+                        ]
+
+        for task in tasks:
+            extraction_metric.add(task.result().emit())
         self.report.add_process_metric(extraction_metric.emit())
 
     def run_transformers(self):
         transformation_metric = self.process_metric_factory("Transformation")
         print("Transformers:")
-        for transformer in self.transformers:
-            print("\t", transformer.name, end="\n\t")
-            summary = transformer.run_transformation()
-            transformation_metric.add(summary.emit())
+        with transformation_metric.measure(), WorkerPool(
+            self.transform_workers
+        ) as pool:
+            for transformer in self.transformers:
+                print("\t", transformer.name, end="\n\t")
+                summary = transformer.run_transformation(
+                    manifest=self.manifest, pool=pool, store=self.store
+                )
+                transformation_metric.add(summary.emit())
+                self.save_manifest()
 
         self.report.add_process_metric(transformation_metric.emit())
 
     def run_loaders(self):
         load_metric = self.process_metric_factory("Loading")
         print("Loaders")
-        for loader in self.loaders:
-            print("\t", loader.name)
-            summary = loader.load_data()
-            load_metric.add(summary.emit())
+        with load_metric.measure():
+            for loader in self.loaders:
+                print("\t", loader.name)
+                summary = loader.load_data(manifest=self.manifest, store=self.store)
+                load_metric.add(summary.emit())
+                self.save_manifest()
+        self.clear_store()
         self.report.add_process_metric(load_metric.emit())
 
-    def run(self):
+    def clear_store(self):
+        if self.store is not None:
+            self.store.clear()
+
+    def save_manifest(self):
+        if self.manifest is not None:
+            self.manifest.save()
+
+    def run_scheduled(self, max_workers=None):
+        """
+        Runs every component as soon as its upstream components finish and
+        records the critical path of the run in the report
+        """
+        if self.async_extraction:
+            # scheduled extractors run on their own thread and event loop each
+            raise ValueError("async_extraction is not supported by scheduled runs")
+        pool = WorkerPool(self.transform_workers)
+        # transformers share the pool, and transformers and loaders running
+        # side by side share its budget of cores
+        scheduler = DAGScheduler(max_workers, cpu_workers=pool.max_workers)
+        for extractor in self.extractors:
+            scheduler.add(extractor, "Extraction", extractor.extract, cpu_bound=False)
+        for transformer in self.transformers:
+            run = functools.partial(
+                transformer.run_transformation,
+                manifest=self.manifest,
+                pool=pool,
+                store=self.store,
+            )
+            scheduler.add(transformer, "Transformation", run)
+        for loader in self.loaders:
+            run = functools.partial(
+                loader.load_data, manifest=self.manifest, store=self.store
+            )
+            scheduler.add(loader, "Loading", run)
+
+        run_metric = self.process_metric_factory("Scheduled Run")
+        with run_metric.measure(), pool:
+            tasks = scheduler.run()
+        self.clear_store()
+        self.save_manifest()
+        for stage in ("Extraction", "Transformation", "Loading"):
+            process_metric = self.process_metric_factory(stage)
+            for task in tasks:
+                if task.stage == stage:
+                    process_metric.add(task.result.emit())
+            self.report.add_process_metric(process_metric.emit())
+
+        critical_path = self.process_metric_factory("Critical Path")
+        for task in scheduler.critical_path():
+            metric = Metric(task.name)
+            metric.add(stage=task.stage)
+            metric.add(start=round(task.start, 3))
+            metric.add(end=round(task.end, 3))
+            metric.add(duration=round(task.duration, 3))
+            critical_path.add(metric.emit())
+        critical_path.metrics.update(run_metric.metrics)
+        self.report.add_process_metric(critical_path.emit())
+        return self.report
+
+    def run(self, scheduled=False):
         # controls the step by step running process of the pipeline
         # determines how each step would run
+        if scheduled:
+            return self.run_scheduled()
         self.run_extractors()
         self.run_transformers()
         self.run_loaders()
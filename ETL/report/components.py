@@ -1,6 +1,128 @@
 from report.parsers import *
 
-import json
+import contextlib
+import threading
+import psutil
+import time
+
+
+def timed(clock, fn, *args):
+    """
+    Calls `fn(*args)` and returns its result with the `clock` time it took.
+    Used to send the cpu time of work done in pool threads
+    (`time.thread_time`) or worker processes (`time.process_time`) back to
+    the stage that submitted it
+    """
+    start = clock()
+    result = fn(*args)
+    return result, clock() - start
+
+
+def cpu_seconds(process):
+    times = process.cpu_times()
+    return times.user + times.system
+
+
+class ResourceSampler(threading.Thread):
+    """
+    Samples the resident memory of this process every `interval` seconds and
+    keeps the highest value seen. `ru_maxrss` is a high-water mark over the
+    whole life of the process, which says nothing about the current block.
+
+    With `process_wide` it also follows the cpu time of every descendant
+    process. Pool workers are started from a forkserver, so they are not
+    children of this process and never show up in RUSAGE_CHILDREN; workers
+    exiting between two samples only lose their last `interval`
+    """
+
+    def __init__(self, interval=0.02, process_wide=False):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.process_wide = process_wide
+        self.process = psutil.Process()
+        self.baseline = self.rss()
+        self.peak = self.baseline
+        self.start_cpu = cpu_seconds(self.process)
+        self.start_descendants = self.descendants_cpu() if process_wide else {}
+        self.descendants = dict(self.start_descendants)
+        self.done = threading.Event()
+
+    def rss(self):
+        return self.process.memory_info().rss
+
+    def descendants_cpu(self):
+        usage = dict()
+        for child in self.process.children(recursive=True):
+            try:
+                usage[(child.pid, child.create_time())] = cpu_seconds(child)
+            except psutil.Error:
+                pass
+        return usage
+
+    def sample(self):
+        self.peak = max(self.peak, self.rss())
+        if self.process_wide:
+            self.descendants.update(self.descendants_cpu())
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.done.set()
+        self.join()
+        self.sample()
+        return self.peak - self.baseline
+
+    def cpu_time(self):
+        """Cpu time of this process and its descendants since the start"""
+        descendants = sum(
+            cpu - self.start_descendants.get(key, 0)
+            for key, cpu in self.descendants.items()
+        )
+        return cpu_seconds(self.process) - self.start_cpu + descendants
+
+
+@contextlib.contextmanager
+def measure(metric, process_wide=False, thread_cpu=True):
+    """
+    Records the wall time, cpu time and memory growth of the enclosed block
+    on `metric`, along with throughput for the rows and bytes it counted.
+
+    `peak_rss_growth` is the highest resident memory of the process sampled
+    during the block above its level when the block started. `cpu_time` is
+    the cpu time of the thread running the block plus the `worker_cpu_time`
+    the block reported for work it handed to pool threads or processes, so
+    stages running at the same time are not counted against each other.
+    With `process_wide` it is the cpu time of the whole process and its
+    worker processes instead, for blocks covering a whole run. Blocks
+    sharing their thread with others (coroutines on one event loop) pass
+    `thread_cpu=False` and only count their workers
+    """
+    start = time.perf_counter()
+    start_cpu = time.thread_time()
+    sampler = ResourceSampler(process_wide=process_wide)
+    sampler.start()
+    try:
+        yield metric
+    finally:
+        wall_time = time.perf_counter() - start
+        rss_growth = sampler.stop()
+        metrics = metric.metrics
+        if process_wide:
+            cpu_time = sampler.cpu_time()
+        else:
+            cpu_time = metrics.get("worker_cpu_time", 0)
+            if thread_cpu:
+                cpu_time += time.thread_time() - start_cpu
+        metrics["wall_time"] = round(wall_time, 3)
+        metrics["cpu_time"] = round(cpu_time, 3)
+        metrics["peak_rss_growth"] = rss_growth
+        if wall_time > 0 and metrics.get("rows_processed"):
+            metrics["rows_per_second"] = round(metrics["rows_processed"] / wall_time)
+        nbytes = metrics.get("bytes_downloaded") or metrics.get("bytes_read")
+        if wall_time > 0 and nbytes:
+            metrics["bytes_per_second"] = round(nbytes / wall_time)
 
 
 class Report:
@@ -45,12 +167,17 @@ class ProcessMetric:
     def __init__(self, process_name):
         self.name = process_name
         self.objects = list()
+        self.metrics = dict()
 
     def add(self, obj_metric):
         self.objects.append(obj_metric)
 
+    def measure(self):
+        # a process metric covers every component of a pipeline step
+        return measure(self, process_wide=True)
+
     def emit(self):
-        return {"process": self.name, "objects": self.objects}
+        return {"process": self.name, "metrics": self.metrics, "objects": self.objects}
 
 
 # def __call__(self, process_name):
@@ -66,6 +193,14 @@ class Metric:
     def add(self, **component):
         self.metrics.update(component)
 
+    def add_worker_cpu_time(self, seconds):
+        """Adds cpu time spent in pool threads or processes on this component's work"""
+        total = self.metrics.get("worker_cpu_time", 0) + seconds
+        self.metrics["worker_cpu_time"] = round(total, 3)
+
+    def measure(self, thread_cpu=True):
+        return measure(self, thread_cpu=thread_cpu)
+
     def emit(self):
         return {"name": self.name, "metrics": self.metrics}
 
@@ -32,6 +32,8 @@ class TextParser(BaseParser):
         for process in processes:
             process_name = process.get("process", "Unknown Process")
             text_output.append(f"Process: {process_name}")
+            for metric, value in process.get("metrics", {}).items():
+                text_output.append(f"\t{metric}: {value}")
             for obj in process.get("objects", []):
                 text_output.append(f"\tObject Name: {obj.get('name', 'Unknown Name')}")
                 metrics = obj.get("metrics", {})
@@ -49,6 +51,8 @@ class MarkdownParser(BaseParser):
         for process in processes:
             process_name = process.get("process", "Unknown Process")
             markdown_output.append(f"## Process: {process_name}")
+            for metric, value in process.get("metrics", {}).items():
+                markdown_output.append(f"- **{metric}**: {value}")
             for obj in process.get("objects", []):
                 markdown_output.append(
                     f"### Object Name: {obj.get('name', 'Unknown Name')}"
@@ -82,6 +86,8 @@ class CSVParser(BaseParser):
         processes = report.get("processes", [])
         for process in processes:
             process_name = process.get("process", "Unknown Process")
+            for metric, value in process.get("metrics", {}).items():
+                csv_writer.writerow([process_name, "", metric, value])
             for obj in process.get("objects", []):
                 object_name = obj.get("name", "Unknown Name")
                 metrics = obj.get("metrics", {})
@@ -109,6 +115,10 @@ class XMLParser(BaseParser):
         for process in processes:
             process_element = SubElement(root, "process")
             process_element.set("name", process.get("process", "Unknown Process"))
+            for metric, value in process.get("metrics", {}).items():
+                metric_element = SubElement(process_element, "metric")
+                metric_element.set("name", metric)
+                metric_element.text = str(value)
             for obj in process.get("objects", []):
                 object_element = SubElement(process_element, "object")
                 object_element.set("name", obj.get("name", "Unknown Name"))
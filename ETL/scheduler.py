@@ -0,0 +1,117 @@
+"""
+Dependency driven scheduling of pipeline components
+
+Every component declares the directories it reads (`input_dirs`) and writes
+(`output_dirs`). A component depends on each component added before it that
+writes one of its input or output directories, or reads one of its output
+directories, and it is started as soon as all of those have finished, so independent chains (e.g GTI and UNCTADstat) run
+side by side instead of stage by stage.
+
+Components doing their work on the cpu (transformers, loaders) also take one
+of `cpu_workers` slots while they run, so overlapping chains do not each use
+a full set of cores. Network bound components (extractors) do not.
+"""
+
+import concurrent.futures
+import threading
+import time
+import os
+
+
+class Task:
+
+    def __init__(self, component, stage, run, cpu_bound=True):
+        self.component = component
+        self.stage = stage
+        self.run = run
+        self.cpu_bound = cpu_bound
+        self.upstream = []
+        self.downstream = []
+        self.start = None
+        self.end = None
+        self.result = None
+
+    @property
+    def name(self):
+        return self.component.name
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return f"Task(stage = {self.stage}, name = {self.name})"
+
+
+class DAGScheduler:
+
+    def __init__(self, max_workers=None, cpu_workers=None):
+        self.max_workers = max_workers
+        self.cpu_workers = cpu_workers or os.cpu_count() or 1
+        self.cpu_slots = threading.BoundedSemaphore(self.cpu_workers)
+        self.tasks = []
+        self.started = None
+
+    def add(self, component, stage, run, cpu_bound=True):
+        task = Task(component, stage, run, cpu_bound)
+        inputs = {p.resolve() for p in component.input_dirs}
+        outputs = {p.resolve() for p in component.output_dirs}
+        for previous in self.tasks:
+            produced = {p.resolve() for p in previous.component.output_dirs}
+            consumed = {p.resolve() for p in previous.component.input_dirs}
+            # reads what it wrote, writes where it wrote (e.g two loaders
+            # writing the same workbook) or writes what it reads
+            if produced & inputs or produced & outputs or consumed & outputs:
+                previous.downstream.append(task)
+                task.upstream.append(previous)
+        self.tasks.append(task)
+        return task
+
+    def execute(self, task):
+        if not task.cpu_bound:
+            return self.run_task(task)
+        with self.cpu_slots:
+            return self.run_task(task)
+
+    def run_task(self, task):
+        task.start = time.perf_counter() - self.started
+        task.result = task.run()
+        task.end = time.perf_counter() - self.started
+        return task
+
+    def run(self):
+        """Runs every task once all of its upstream tasks have finished"""
+        self.started = time.perf_counter()
+        waiting = {task: len(task.upstream) for task in self.tasks}
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+            running = {
+                executor.submit(self.execute, task)
+                for task, count in waiting.items()
+                if count == 0
+            }
+            while running:
+                done, running = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    task = future.result()
+                    for child in task.downstream:
+                        waiting[child] -= 1
+                        if waiting[child] == 0:
+                            running.add(executor.submit(self.execute, child))
+        return self.tasks
+
+    def critical_path(self):
+        """
+        Returns the chain of tasks that determined the total run time: starting
+        from the last task to finish, repeatedly follow the upstream task that
+        finished last
+        """
+        if not self.tasks:
+            return []
+        task = max(self.tasks, key=lambda t: t.end)
+        path = [task]
+        while task.upstream:
+            task = max(task.upstream, key=lambda t: t.end)
+            path.append(task)
+        return list(reversed(path))
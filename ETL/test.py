@@ -10,22 +10,22 @@ from loaders.gti_loader import GTILoader
 
 from pipeline import Pipeline
 
-pipeline = Pipeline()
-
-pipeline.add(
-    # extractors = [
-    #     GTIExtractor(**{"start" : 2011, "end" : 2024, "upload" : 2024}),
-    #     #GTIExtractor(),
-    #     UnctadStatExtractor(**{"variables" : ["US.PCI", "US.TermsOfTrade", 	"US.GDPComponent"]})
-    #     ],
-    # transformers = [
-    #     GTITransformer(),
-    #     UnctadStatTransformer()
-    # ],
-    loaders=[UnctadStatLoader(), GTILoader(), GenericMergeLoader()]
-)
-
-
-print(pipeline.outline())
-
-pipeline.run()
+if __name__ == "__main__":
+    pipeline = Pipeline()
+
+    pipeline.add(
+        # extractors = [
+        #     GTIExtractor(**{"start" : 2011, "end" : 2024, "upload" : 2024}),
+        #     #GTIExtractor(),
+        #     UnctadStatExtractor(**{"variables" : ["US.PCI", "US.TermsOfTrade", 	"US.GDPComponent"]})
+        #     ],
+        # transformers = [
+        #     GTITransformer(),
+        #     UnctadStatTransformer()
+        # ],
+        loaders=[UnctadStatLoader(), GTILoader(), GenericMergeLoader()]
+    )
+
+    print(pipeline.outline())
+
+    pipeline.run()
@@ -0,0 +1,10 @@
+"""
+Tests of the ETL package, run from the ETL folder:
+
+    python -m unittest discover -s tests -t .
+"""
+
+import logging
+
+# components log retries and failures the tests provoke on purpose
+logging.getLogger("ETL").addHandler(logging.NullHandler())
@@ -0,0 +1,177 @@
+"""
+Extractor requests against the local mock source server: retries, backoff,
+Retry-After, resumed and conditional downloads
+"""
+
+from pathlib import Path
+import tempfile
+import unittest
+import json
+import time
+import os
+
+from benchmarks.fixtures import GTI_UPLOAD, write_gti
+from benchmarks.server import MockSourceServer
+from extractors.gti import GTIExtractor
+from extractors.policy import RequestPolicy
+
+YEAR = 2011
+NAME = f"GTI_{YEAR}_{GTI_UPLOAD[-2:]}.csv"
+
+
+class RequestPolicyTest(unittest.TestCase):
+
+    def test_delay_caps_retry_after_at_max_backoff(self):
+        policy = RequestPolicy(backoff=0.5, max_backoff=2.0)
+        self.assertEqual(policy.delay(0, retry_after=3600), 2.0)
+        self.assertEqual(policy.delay(0, retry_after=1.5), 1.5)
+
+    def test_delay_backs_off_exponentially_up_to_max_backoff(self):
+        policy = RequestPolicy(backoff=0.5, max_backoff=2.0)
+        for attempt in range(6):
+            delay = policy.delay(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(2.0, 0.5 * 2**attempt))
+
+    def test_parse_retry_after(self):
+        self.assertEqual(RequestPolicy.parse_retry_after("120"), 120.0)
+        self.assertEqual(RequestPolicy.parse_retry_after("-5"), 0.0)
+        self.assertIsNone(RequestPolicy.parse_retry_after(None))
+        self.assertIsNone(RequestPolicy.parse_retry_after("not a date"))
+        past = RequestPolicy.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT")
+        self.assertEqual(past, 0.0)
+
+
+class ExtractorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        (self.source,) = write_gti(self.root / "source" / "gti", [YEAR], 50)
+        self.save_dir = self.root / "extracted"
+        self.server = MockSourceServer(self.root / "source").start()
+        self.addCleanup(self.server.stop)
+
+    def extractor(self, **policy):
+        policy = {"retries": 3, "backoff": 0.01, "max_backoff": 0.05, **policy}
+        return GTIExtractor(
+            upload=GTI_UPLOAD,
+            start=YEAR,
+            end=YEAR,
+            root_url=f"{self.server.url}/gti",
+            save_dir=self.save_dir,
+            cache_dir=self.root / "cache",
+            request_policy=RequestPolicy(**policy),
+        )
+
+    @property
+    def target(self):
+        return self.save_dir / f"GTI_{YEAR}.csv"
+
+    @property
+    def partial(self):
+        return self.save_dir / ".partial"
+
+    def request_headers(self):
+        return [headers for name, headers in self.server.requests if name == NAME]
+
+    def test_download(self):
+        metric = self.extractor().extract().metrics
+        self.assertEqual(metric["number_of_files_downloaded"], 1)
+        self.assertEqual(metric["request_retries"], 0)
+        self.assertEqual(self.target.read_bytes(), self.source.read_bytes())
+        self.assertEqual(list(self.partial.iterdir()), [])
+
+    def test_retries_transient_errors(self):
+        self.server.inject(NAME, status=503, times=2)
+        metric = self.extractor().extract().metrics
+        self.assertEqual(metric["request_retries"], 2)
+        self.assertEqual(metric["failed_downloads"], 0)
+        self.assertEqual(self.target.read_bytes(), self.source.read_bytes())
+
+    def test_gives_up_after_the_last_retry(self):
+        self.server.inject(NAME, status=503, times=3)
+        metric = self.extractor(retries=2).extract().metrics
+        self.assertEqual(len(self.request_headers()), 3)
+        self.assertEqual(metric["request_retries"], 2)
+        self.assertEqual(metric["failed_downloads"], 1)
+        self.assertEqual(metric["number_of_files_downloaded"], 0)
+        self.assertFalse(self.target.exists())
+
+    def test_client_errors_are_not_retried(self):
+        self.server.inject(NAME, status=403)
+        metric = self.extractor().extract().metrics
+        self.assertEqual(len(self.request_headers()), 1)
+        self.assertEqual(metric["request_retries"], 0)
+        self.assertEqual(metric["failed_downloads"], 1)
+
+    def test_retry_after_is_capped_at_max_backoff(self):
+        self.server.inject(NAME, status=429, headers={"Retry-After": "3600"})
+        start = time.monotonic()
+        metric = self.extractor(max_backoff=0.2).extract().metrics
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(metric["request_retries"], 1)
+        self.assertEqual(self.target.read_bytes(), self.source.read_bytes())
+
+    def test_resumes_an_interrupted_download(self):
+        size = self.source.stat().st_size
+        offset = size // 2
+        self.server.inject(NAME, truncate=offset)
+        metric = self.extractor().extract().metrics
+        self.assertEqual(metric["request_retries"], 1)
+        self.assertEqual(metric["bytes_resumed"], offset)
+        self.assertEqual(self.target.read_bytes(), self.source.read_bytes())
+        resumed = self.request_headers()[-1]
+        self.assertEqual(resumed["Range"], f"bytes={offset}-")
+        self.assertEqual(resumed["If-Range"], f'"{self.etag()}"')
+        self.assertEqual(list(self.partial.iterdir()), [])
+
+    def test_unsatisfiable_range_restarts_the_download(self):
+        # a partial file longer than the source, e.g the source shrank
+        extractor = self.extractor()
+        link = next(extractor.get_links())
+        part = extractor.part_path(link)
+        part.parent.mkdir(parents=True)
+        part.write_bytes(b"x" * (self.source.stat().st_size + 10))
+        state = {"url": link.url, "validator": '"old"', "size": None, "segments": None}
+        extractor.part_state_path(link).write_text(json.dumps(state))
+        metric = extractor.extract().metrics
+        statuses = self.request_headers()
+        self.assertEqual(len(statuses), 2)
+        self.assertIn("Range", statuses[0])
+        self.assertNotIn("Range", statuses[1])
+        self.assertEqual(metric["request_retries"], 1)
+        self.assertEqual(metric["bytes_resumed"], 0)
+        self.assertEqual(self.target.read_bytes(), self.source.read_bytes())
+
+    def test_not_modified_uses_the_cached_copy(self):
+        self.extractor().extract()
+        mtime = self.target.stat().st_mtime_ns
+        metric = self.extractor().extract().metrics
+        self.assertEqual(
+            self.request_headers()[-1]["If-None-Match"], f'"{self.etag()}"'
+        )
+        self.assertEqual(metric["cache_hits"], 1)
+        self.assertEqual(metric["number_of_files_downloaded"], 0)
+        self.assertEqual(self.target.stat().st_mtime_ns, mtime)
+
+    def test_unchanged_content_keeps_the_target(self):
+        self.extractor().extract()
+        mtime = self.target.stat().st_mtime_ns
+        # same bytes under a new validator
+        stat = self.source.stat()
+        os.utime(self.source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        metric = self.extractor().extract().metrics
+        self.assertEqual(metric["cache_hits"], 0)
+        self.assertEqual(metric["unchanged_downloads"], 1)
+        self.assertEqual(self.target.stat().st_mtime_ns, mtime)
+        self.assertEqual(list(self.partial.iterdir()), [])
+
+    def etag(self):
+        stat = self.source.stat()
+        return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""Incremental run manifest: only content changes count as changed inputs"""
+
+from pathlib import Path
+import tempfile
+import unittest
+import os
+
+from loaders.sqlite import SQLiteLoader
+from utils.manifest import Manifest
+
+
+class ManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        self.data_dir = self.root / "data"
+        self.data_dir.mkdir()
+        self.files = []
+        for name in ("a", "b"):
+            fn = self.data_dir / f"{name}.csv"
+            fn.write_text("Country Name,year,value\nNigeria,2020,1.5\n")
+            self.files.append(fn)
+        self.component = SQLiteLoader(self.data_dir, self.root / "database")
+        self.output = self.root / "output.csv"
+        self.output.write_text("")
+        self.manifest = Manifest(self.root / "manifest.json")
+        self.manifest.record(self.component, self.files, [self.output])
+
+    def touch(self, fn):
+        stat = fn.stat()
+        os.utime(fn, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def test_unrecorded_component_changed_all_inputs(self):
+        manifest = Manifest(self.root / "other.json")
+        self.assertEqual(
+            manifest.changed_inputs(self.component, self.files), self.files
+        )
+        self.assertFalse(manifest.is_current(self.component, self.files))
+
+    def test_unchanged_inputs(self):
+        self.assertEqual(self.manifest.changed_inputs(self.component, self.files), [])
+        self.assertTrue(self.manifest.is_current(self.component, self.files))
+
+    def test_rewrite_with_the_same_bytes_is_not_a_change(self):
+        a = self.files[0]
+        a.write_bytes(a.read_bytes())
+        self.touch(a)
+        self.assertEqual(self.manifest.changed_inputs(self.component, self.files), [])
+        self.assertTrue(self.manifest.is_current(self.component, self.files))
+
+    def test_content_change(self):
+        a = self.files[0]
+        a.write_text("Country Name,year,value\nNigeria,2020,2.5\n")
+        self.touch(a)
+        self.assertEqual(self.manifest.changed_inputs(self.component, self.files), [a])
+        self.assertFalse(self.manifest.is_current(self.component, self.files))
+
+    def test_new_input_or_missing_output_is_not_current(self):
+        c = self.data_dir / "c.csv"
+        c.write_text("Country Name,year,value\n")
+        self.assertFalse(self.manifest.is_current(self.component, self.files + [c]))
+        self.output.unlink()
+        self.assertFalse(self.manifest.is_current(self.component, self.files))
+
+    def test_saved_manifest_is_reloaded(self):
+        self.manifest.save()
+        manifest = Manifest(self.root / "manifest.json")
+        self.assertTrue(manifest.is_current(self.component, self.files))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""SQLite loader: keyed upserts that only rewrite changed rows"""
+
+from pathlib import Path
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from loaders.sqlite import SQLiteLoader, query
+
+
+def frame(values, source="gti"):
+    data = pd.DataFrame(
+        {
+            "Country Name": ["Nigeria", "Ghana", None],
+            "year": [2020, 2020, 2021],
+            "score": values,
+        }
+    )
+    data.attrs["source"] = source
+    return data
+
+
+class SQLiteLoaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        (self.root / "data").mkdir()
+
+    def load(self, *dataset):
+        loader = SQLiteLoader(self.root / "data", self.root / "database")
+        loader.load(iter(dataset))
+        return loader
+
+    def test_load_and_query(self):
+        loader = self.load(frame([1.0, np.nan, 3.0]))
+        metric = loader.metric.metrics
+        self.assertEqual(metric["rows_upserted"], 2)
+        self.assertEqual(metric["rows_skipped"], 1)
+        data = loader.query()
+        self.assertEqual(data["country"].tolist(), ["Ghana", "Nigeria"])
+        self.assertEqual(data["variable"].tolist(), ["gti.score", "gti.score"])
+        # NaN is stored as NULL
+        self.assertTrue(np.isnan(data["value"].iloc[0]))
+        self.assertEqual(data["value"].iloc[1], 1.0)
+
+    def test_reload_only_rewrites_changed_rows(self):
+        self.load(frame([1.0, np.nan, 3.0]))
+        metric = self.load(frame([1.0, np.nan, 3.0])).metric.metrics
+        self.assertEqual(metric["rows_upserted"], 0)
+        self.assertEqual(metric["rows_unchanged"], 2)
+
+        loader = self.load(frame([1.0, 2.0, 3.0]))
+        metric = loader.metric.metrics
+        self.assertEqual(metric["rows_upserted"], 1)
+        self.assertEqual(metric["rows_unchanged"], 1)
+        ghana = query(loader.path, country="Ghana")
+        self.assertEqual(ghana["value"].tolist(), [2.0])
+
+    def test_query_filters(self):
+        data = frame([1.0, 2.0, 3.0])
+        data.loc[2, "Country Name"] = "Nigeria"
+        loader = self.load(data, frame([4.0, 5.0, 6.0], source="unctad"))
+        nigeria = loader.query(country="Nigeria", start=2021)
+        self.assertEqual(nigeria["value"].tolist(), [3.0])
+        unctad = loader.query(variables="unctad.score")
+        self.assertEqual(unctad["value"].tolist(), [5.0, 4.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,15 +4,15 @@ All tranformers are to inherit from BaseTransformClass to access
 its read method and logger attribute
 """
 
-from parallelbar import progress_imap
 from pathlib import Path
-import multiprocessing
-import pandas as pd
 import logging
 import abc
 
-from utils.io import IOMixin
-from report.components import Metric
+from utils.io import ChunkWriter, IOMixin
+from utils.workers import WorkerPool
+from utils.schema import SchemaCache
+from utils.shm import share
+from report.components import Metric, ResourceSampler
 
 
 logger = logging.getLogger("ETL.Transform")
@@ -25,49 +25,114 @@ class BaseTransformClass(abc.ABC, IOMixin):
     default_data_dir = ""
     default_save_dir = ""
 
+    # `usecols` (list or callable) and `dtype` passed to the csv/excel readers
+    read_columns = None
+    read_dtypes = None
+    # TransformPlan describing the transformation (see transformers/plan.py)
+    plan = None
+    default_cache_dir = "data/.cache"
+    # set by `run_transformation` when given a FrameStore: transformed frames
+    # are sent back to the parent and only written if the store persists them
+    handoff = False
+    write_output = True
+    # hand the frames over in shared memory instead of pickling them
+    shared_memory = False
+
     def __init__(
-        self, data_dir=None, save_dir=None, save_file_type="excel", metric_class=Metric
+        self,
+        data_dir=None,
+        save_dir=None,
+        save_file_type="parquet",
+        metric_class=Metric,
+        read_in_workers=True,
+        chunksize=None,
+        use_schema_cache=True,
+        cache_dir=None,
     ):
         self.name = self.__class__.name or self.__class__.__name__
         self.logger = logging.getLogger(f"ETL.Transform.{self.name}")
         # self.extension_reader = {".xlsx": pd.read_excel, ".csv": pd.read_csv}
         # self.extension_and_writer = {"excel" : ("xlsx", pd.DataFrame.to_excel), "csv" : ("csv", pd.DataFrame.to_csv)}
         self.save_file_type = save_file_type
+        self.read_in_workers = read_in_workers
+        self.chunksize = chunksize
         self.setup_directories(data_dir, save_dir)
+        self.setup_schema_cache(use_schema_cache, cache_dir)
         self.setup_metric_componenet(metric_class)
 
+    def setup_schema_cache(self, use_schema_cache, cache_dir):
+        self.schema_cache = None
+        if use_schema_cache:
+            cache_dir = Path(cache_dir or self.default_cache_dir)
+            self.schema_cache = SchemaCache(cache_dir / "schemas" / f"{self.name}.json")
+
     def setup_metric_componenet(self, metric_class):
         self.metric = metric_class(self.name)
         self.metric.add(data_directory=str(self.data_dir))
         self.metric.add(save_directory=str(self.save_dir))
 
-    @abc.abstractmethod
     def transform(self, data_dict):
         """
         Serves as the entry point to the transformer object.
         All tranformation function or steps should be carried out in the function.
+        By default the transformer's `plan` is applied and the result written.
 
         data_dict : A dictionary containing the data file name and the pandas dataframe of the data file
 
         returns a dictionary containing the data file name and the transformed pandas dataframe
         """
-        raise NotImplemented
+        if self.plan is None:
+            raise NotImplementedError(
+                f"{self.__class__.__name__} defines neither `plan` nor `transform`"
+            )
+        data = self.plan.apply(data_dict.get("data"))
+        self.write(data_dict.get("name"), data)
+        return data
 
-    def fetch_data(self):
+    def transform_chunk(self, data):
+        """
+        Transforms one chunk of a data file read in chunked mode and returns it.
+        Steps that need the whole file (e.g sorting) cannot be done here
+        """
+        if self.plan is None:
+            raise NotImplementedError(
+                f"{self.__class__.__name__} does not support chunked transformation"
+            )
+        return self.plan.apply(data, chunk=True)
+
+    def read_options(self, fn):
+        options = dict()
+        if fn.suffix not in (".csv", ".xlsx"):
+            return options
+        if self.read_columns is not None:
+            options["usecols"] = self.read_columns
+        elif self.plan is not None:
+            options["usecols"] = self.plan.usecols
+        if self.read_dtypes is not None:
+            options["dtype"] = self.read_dtypes
+        return options
+
+    def read(self, fn, **options):
+        return super().read(fn, **{**self.read_options(fn), **options})
+
+    def write(self, name, data):
+        if not self.write_output:
+            return None
+        return super().write(name, data)
+
+    def output_path(self, fn):
+        """Returns the file `transform` writes for the data file `fn`"""
+        ext, _ = self.get_extension_and_writer()
+        return self.save_dir / f"{fn.name.lower().split('.')[0]}.{ext}"
+
+    def fetch_data(self, files=None):
         """
         Reads in the data files contain in the data directory
+        (or only `files` if given)
         returns a dictionary of filename in lower case as the key and
         the read in data content as the value
         """
-        try:
-            files = [f for f in self.data_dir.iterdir() if f.is_file()]
-        except Exception as e:
-            self.logger.exception(
-                "Encountered An Error trying to read %s ", self.data_dir
-            )
-            raise e
-        else:
-            self.logger.info("%d files found in %s folder", len(files), self.data_dir)
+        files = self.list_files() if files is None else files
         datasets = []
         for fn in files:
             name = fn.name.lower().split(".")[0]
@@ -75,20 +140,196 @@ class BaseTransformClass(abc.ABC, IOMixin):
         self.metric.add(number_of_files_read=len(datasets))
         return datasets
 
-    def run_transformation(self, workers=None):
+    def transform_file(self, fn):
+        """
+        Reads, transforms and writes a single data file inside a worker.
+        Only a small summary is sent back to the parent process, the
+        dataframes never cross the process boundary unless they are handed
+        off to a FrameStore. Workers are shared by every transformer of the
+        run, so the memory reported is the growth sampled during this task
+        rather than the worker's lifetime peak
+        """
+        sampler = ResourceSampler()
+        sampler.start()
+        try:
+            if self.chunksize and fn.suffix == ".csv":
+                summary = self.transform_chunks(fn)
+            else:
+                summary = self.transform_whole(fn)
+        finally:
+            rss_growth = sampler.stop()
+        summary["peak_rss_growth"] = rss_growth
+        return summary
+
+    def transform_whole(self, fn):
+        """Reads, transforms and writes a data file in one piece"""
+        name = fn.name.lower().split(".")[0]
+        data = self.read(fn)
+        data_bytes = int(data.memory_usage(deep=True).sum())
+        data = self.transform({"name": name, "data": data})
+        rows = len(data) if data is not None else 0
+        summary = {
+            "name": name,
+            "rows": rows,
+            "data_bytes": data_bytes,
+            **self.schema_summary(),
+        }
+        if self.handoff:
+            summary["data"] = share(data) if self.shared_memory else data
+        return summary
+
+    def schema_summary(self):
+        """Schema cache state a worker hands back to the parent process"""
+        if self.schema_cache is None:
+            return dict()
+        return {
+            "schemas": self.schema_cache.updated,
+            "schema_hits": self.schema_cache.hits,
+        }
+
+    def update_schema_cache(self, summaries):
+        if self.schema_cache is None:
+            return
+        hits = self.schema_cache.hits
+        for summary in summaries:
+            self.schema_cache.merge(summary.get("schemas", {}))
+            hits += summary.get("schema_hits", 0)
+        self.schema_cache.save()
+        self.metric.add(schema_cache_hits=hits)
+
+    def transform_chunks(self, fn):
+        """
+        Streams a csv data file through `transform_chunk` `chunksize` rows at
+        a time and appends each result to the output file, so files larger
+        than memory can be transformed
+        """
+        name = fn.name.lower().split(".")[0]
+        rows = 0
+        peak_chunk_bytes = 0
+        with ChunkWriter(self.output_path(fn), self.save_file_type) as writer:
+            for chunk in self.read(fn, chunksize=self.chunksize):
+                peak_chunk_bytes = max(
+                    peak_chunk_bytes, int(chunk.memory_usage(deep=True).sum())
+                )
+                data = self.transform_chunk(chunk)
+                writer.append(data)
+                rows += len(data)
+            if not writer.written:
+                # no chunk at all, the output gets the header of the transformed input
+                header = self.transform_chunk(self.read(fn, nrows=0))
+                writer.columns = list(header.columns)
+        return {
+            "name": name,
+            "rows": rows,
+            "peak_chunk_bytes": peak_chunk_bytes,
+            **self.schema_summary(),
+        }
+
+    def pending_files(self, files, manifest):
+        """
+        Returns the files that need transforming: inputs that changed since
+        the run recorded in `manifest`, or whose output is missing
+        """
+        changed = set(manifest.changed_inputs(self, files))
+        return [
+            fn for fn in files if fn in changed or not self.output_path(fn).is_file()
+        ]
+
+    def store_outputs(self, store, files, datasets):
+        """Hands the transformed `datasets` of `files` over to `store`"""
+        stored = 0
+        for fn, data in zip(files, datasets):
+            if data is not None:
+                store.put(self.output_path(fn), data)
+                stored += store.size(self.output_path(fn))
+        self.metric.add(bytes_handed_off=stored)
+
+    def run_transformation(self, workers=None, manifest=None, pool=None, store=None):
         """
         Run the transform method of the given transformation class concurrently
         in a multi-core process using the specified number of `workers`.
 
-        The tranformed data is also passed to a merge method and attaches and returns
-        the result of the merge operation
+        Files are submitted to `pool` (a WorkerPool shared by the pipeline)
+        when given, otherwise to a pool started for this transformer only.
+        When a `manifest` is given only the files whose inputs changed since
+        the last recorded run are transformed. With a `store` (a FrameStore)
+        the transformed frames are handed to it instead of being written,
+        unless it persists them.
         """
-        cpu_count = multiprocessing.cpu_count()
-        workers = workers if workers is not None else cpu_count
-        self.logger.info(f"Transformation Process: Using {workers} workers")
-        progress_imap(self.transform, self.fetch_data(), n_cpu=workers)
-        saved_files = len([f for f in self.save_dir.iterdir()])
-        self.metric.add(number_of_files_written=saved_files)
+        if pool is None:
+            with WorkerPool(workers) as pool:
+                return self.run_transformation(
+                    manifest=manifest, pool=pool, store=store
+                )
+
+        self.handoff = store is not None
+        self.write_output = store is None or store.persist
+        self.shared_memory = store is not None and store.shared_memory
+        with self.metric.measure():
+            files = self.list_files()
+            if manifest is not None:
+                pending = self.pending_files(files, manifest)
+                self.metric.add(number_of_files_skipped=len(files) - len(pending))
+                self.logger.info(
+                    "Incremental run: %d of %d files changed", len(pending), len(files)
+                )
+            else:
+                pending = files
+
+            self.metric.add(bytes_read=sum(fn.stat().st_size for fn in pending))
+            if not pending:
+                self.metric.add(number_of_files_read=0)
+            elif self.read_in_workers:
+                workers = pool.workers_for(len(pending))
+                self.logger.info(f"Transformation Process: Using {workers} workers")
+                self.metric.add(workers=workers)
+                summaries = pool.map(
+                    self.transform_file, pending, desc=self.name, metric=self.metric
+                )
+                if store is not None:
+                    datasets = [s.pop("data", None) for s in summaries]
+                    self.store_outputs(store, pending, datasets)
+                self.metric.add(number_of_files_read=len(summaries))
+                self.metric.add(rows_processed=sum(s["rows"] for s in summaries))
+                self.metric.add(
+                    peak_worker_rss_growth=max(s["peak_rss_growth"] for s in summaries)
+                )
+                self.metric.add(
+                    bytes_in_memory=sum(s.get("data_bytes", 0) for s in summaries)
+                )
+                self.update_schema_cache(summaries)
+                if self.chunksize:
+                    peak_chunk_bytes = max(
+                        s.get("peak_chunk_bytes", 0) for s in summaries
+                    )
+                    self.metric.add(chunksize=self.chunksize)
+                    self.metric.add(peak_chunk_bytes=peak_chunk_bytes)
+            else:
+                workers = pool.workers_for(len(pending))
+                self.logger.info(f"Transformation Process: Using {workers} workers")
+                self.metric.add(workers=workers)
+                datasets = self.fetch_data(pending)
+                self.metric.add(rows_processed=sum(len(d["data"]) for d in datasets))
+                self.metric.add(
+                    bytes_in_memory=sum(
+                        int(d["data"].memory_usage(deep=True).sum()) for d in datasets
+                    )
+                )
+                self.update_schema_cache([])
+                datasets = pool.map(
+                    self.transform, datasets, desc=self.name, metric=self.metric
+                )
+                if store is not None:
+                    self.store_outputs(store, pending, datasets)
+            outputs = [self.output_path(fn) for fn in pending]
+            self.metric.add(
+                bytes_written=sum(fn.stat().st_size for fn in outputs if fn.is_file())
+            )
+            if manifest is not None:
+                outputs = [self.output_path(fn) for fn in files]
+                manifest.record(self, files, outputs)
+            saved_files = len([f for f in self.save_dir.iterdir()])
+            self.metric.add(number_of_files_written=saved_files)
         return self.metric
 
     def __str__(self):
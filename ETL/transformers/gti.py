@@ -1,14 +1,8 @@
 from transformers.base import BaseTransformClass
+from transformers.plan import TransformPlan, Select, Rename, Replace
+from utils.countries import registry
 
 from pathlib import Path
-import pandas as pd
-
-countries_to_replace = {
-    "Egypt": "Egypt, Arab Rep.",
-    "Democratic Republic of the Congo": "Congo, Dem. Rep.",
-    "Republic of the Congo": "Congo, Rep.",
-    "Cote d' Ivoire": "Cote d'Ivoire",
-}
 
 
 class GTITransformer(BaseTransformClass):
@@ -17,12 +11,6 @@ class GTITransformer(BaseTransformClass):
     default_save_dir = parent / "transformed"
 
     filter_prefix = "index"
-    countries_to_replace = {
-        "Egypt, Arab Rep.": "Egypt",
-        "Democratic Republic of the Congo": "Congo, Dem. Rep.",
-        "Republic of the Congo": "Congo, Rep.",
-        "Cote d' Ivoire": "Cote d'Ivoire",
-    }
 
     column_names = {
         "code": "Country Code",
@@ -35,40 +23,16 @@ class GTITransformer(BaseTransformClass):
         f"{filter_prefix}_prop": "prop",
     }
 
-    def rename_countries(self, data):
-        """
-        Renames Countries spelt differently in order to have
-        a uniform data across all data source
-        """
-        data["Country Name"] = data["Country Name"].replace(self.countries_to_replace)
-        return data
-
-    def rename_columns(self, data):
-        """
-        Renames data columns
-        """
-        data = data.rename(columns=self.column_names)
-        return data
-
-    def filter_dataset(self, df):
-        "Return columns that contains the filter_prefix"
-        self.logger.info("Filtering dataset")
-        columns = ["name", "code", "year"]
-        columns.extend(
-            [column for column in df.columns if column.startswith(self.filter_prefix)]
-        )
-        return df[columns]
-
-    def transform(self, data_dict):
-        name = data_dict.get("name")
-        data = data_dict.get("data")
-
-        data = self.filter_dataset(data)
-        data = self.rename_columns(data)
-        data = self.rename_countries(data)
-        self.write(name, data)
-
-        return data
+    plan = TransformPlan(
+        # columns containing the filter_prefix
+        Select(
+            ["name", "code", "year"],
+            where=lambda column, prefix=filter_prefix: column.startswith(prefix),
+        ),
+        Rename(column_names),
+        # countries spelt differently across data sources
+        Replace("Country Name", registry.normalize),
+    )
 
 
 # gti_transformer = GTITransformer('../../data/gti')
@@ -0,0 +1,182 @@
+"""
+Declarative transformation plans
+
+A transformer describes its steps as a `TransformPlan` instead of a chain of
+methods, e.g
+
+    plan = TransformPlan(
+        Select(["name", "year"], where=lambda c: c.startswith("index")),
+        Rename({"name": "Country Name"}),
+        Replace("Country Name", registry.normalize),
+        Sort(["Country Name", "year"]),
+    )
+
+Before a file is transformed the plan is compiled against its columns:
+consecutive `Select`/`Rename` steps are fused into a single projection
+(at most one column take, names are set in place), and the columns the
+projection keeps are pushed into the reader through `usecols`, so dropped
+columns are never parsed. Value steps (`Replace`, `Cast`) update columns in
+place and `Sort` is skipped when transforming chunks of a file.
+"""
+
+
+class Rename:
+    """Renames columns with `function` (applied to every name) then `mapping`"""
+
+    def __init__(self, mapping=None, function=None):
+        self.mapping = mapping or dict()
+        self.function = function
+
+    def __call__(self, column):
+        if self.function is not None:
+            column = self.function(column)
+        return self.mapping.get(column, column)
+
+
+class Select:
+    """
+    Keeps `columns` in the given order followed by every other column,
+    in file order, for which `where` is true
+    """
+
+    def __init__(self, columns=(), where=None):
+        self.columns = list(columns)
+        self.where = where
+
+    def keeps(self, column):
+        return column in self.columns or (
+            self.where is not None and bool(self.where(column))
+        )
+
+    def __call__(self, columns):
+        missing = [c for c in self.columns if c not in columns]
+        if missing:
+            raise KeyError(f"{missing} not in columns")
+        rest = [c for c in columns if c not in self.columns and self.keeps(c)]
+        return self.columns + rest
+
+
+class Replace:
+    """Replaces the values of `column` with `function(column values)`"""
+
+    def __init__(self, column, function):
+        self.column = column
+        self.function = function
+
+    def apply(self, data):
+        data[self.column] = self.function(data[self.column])
+        return data
+
+
+class Cast:
+
+    def __init__(self, dtypes):
+        self.dtypes = dtypes
+
+    def apply(self, data):
+        return data.astype(self.dtypes, copy=False)
+
+
+class Sort:
+
+    # needs the whole file, skipped when transforming chunks
+    chunkable = False
+
+    def __init__(self, by):
+        self.by = by
+
+    def apply(self, data):
+        return data.sort_values(by=self.by)
+
+
+COLUMN_STEPS = (Rename, Select)
+
+
+class Projection:
+    """Consecutive Select/Rename steps fused into a single operation"""
+
+    def __init__(self, steps):
+        self.steps = steps
+
+    def keeps(self, column):
+        """
+        True when a column named `column` survives the projection. Only
+        depends on the column itself, so it can be used as `usecols`
+        """
+        for step in self.steps:
+            if isinstance(step, Rename):
+                column = step(column)
+            elif not step.keeps(column):
+                return False
+        return True
+
+    def resolve(self, columns):
+        """Returns the source columns kept, in output order, and their new names"""
+        current = {column: column for column in columns}  # new name -> source
+        for step in self.steps:
+            if isinstance(step, Rename):
+                current = {step(name): source for name, source in current.items()}
+            else:
+                current = {name: current[name] for name in step(list(current))}
+        return list(current.values()), list(current)
+
+    def compile(self, columns):
+        sources, targets = self.resolve(columns)
+        take = sources != list(columns)
+
+        def project(data):
+            if take:
+                data = data[sources]
+            data.columns = targets
+            return data
+
+        return project
+
+
+class TransformPlan:
+
+    def __init__(self, *steps):
+        self.steps = []
+        for step in steps:
+            if isinstance(step, COLUMN_STEPS):
+                if self.steps and isinstance(self.steps[-1], Projection):
+                    self.steps[-1].steps.append(step)
+                else:
+                    self.steps.append(Projection([step]))
+            else:
+                self.steps.append(step)
+        self.compiled = dict()
+
+    def usecols(self, column):
+        """Reader `usecols` callable keeping the columns of the first projection"""
+        first = self.steps[0] if self.steps else None
+        if not isinstance(first, Projection):
+            return True
+        return first.keeps(column)
+
+    def compile(self, columns, chunk=False):
+        """
+        Returns the operations to run on a frame with `columns`. Projections
+        are resolved against the columns they will see, so the result is
+        cached per column layout
+        """
+        key = (tuple(columns), chunk)
+        if key in self.compiled:
+            return self.compiled[key]
+        operations = []
+        columns = list(columns)
+        for step in self.steps:
+            if isinstance(step, Projection):
+                operations.append(step.compile(columns))
+                columns = step.resolve(columns)[1]
+            elif chunk and not getattr(step, "chunkable", True):
+                continue
+            else:
+                operations.append(step.apply)
+        self.compiled[key] = operations
+        return operations
+
+    def apply(self, data, chunk=False):
+        for operation in self.compile(data.columns, chunk):
+            data = operation(data)
+        return data
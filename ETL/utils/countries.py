@@ -0,0 +1,69 @@
+"""
+Canonical country names shared by all transformers and loaders
+
+Sources spell some countries differently. The registry maps every known
+spelling to one canonical name and stores the result as a pandas
+Categorical, so country columns are compact integer codes that merge and
+sort much faster than Python strings. Categories are kept in sorted order,
+which makes sorting on the codes identical to sorting on the names.
+"""
+
+import pandas as pd
+import numpy as np
+
+COUNTRY_COLUMN = "Country Name"
+
+# spellings used by the data sources mapped to the name used across the project
+COUNTRY_ALIASES = {
+    "Egypt, Arab Rep.": "Egypt",
+    "Democratic Republic of the Congo": "Congo, Dem. Rep.",
+    "Republic of the Congo": "Congo, Rep.",
+    "Cote d' Ivoire": "Cote d'Ivoire",
+}
+
+
+class CountryRegistry:
+
+    def __init__(self, aliases=None):
+        self.aliases = dict(COUNTRY_ALIASES if aliases is None else aliases)
+
+    def canonical(self, name):
+        return self.aliases.get(name, name)
+
+    def normalize(self, names):
+        """
+        Returns `names` mapped to their canonical spelling as a categorical
+        series. Only the distinct names are looked up, rows are resolved in a
+        single vectorized pass over their integer codes
+        """
+        codes, uniques = pd.factorize(names)
+        canonical = [self.canonical(name) for name in uniques]
+        categories = pd.Index(sorted(set(canonical)))
+        lookup = categories.get_indexer(canonical)
+        if len(lookup):
+            # missing names (code -1) are masked, any valid index will do
+            codes = np.where(codes >= 0, lookup[np.maximum(codes, 0)], -1)
+        categorical = pd.Categorical.from_codes(codes, categories=categories)
+        return pd.Series(categorical, index=names.index, name=names.name)
+
+    def encode_frames(self, frames, column=COUNTRY_COLUMN):
+        """
+        Normalizes `column` in every frame to a categorical sharing the same
+        categories, so frames can be concatenated and merged on the codes
+        """
+        frames = list(frames)
+        columns = []
+        for data in frames:
+            if column not in data.columns:
+                continue
+            if not isinstance(data[column].dtype, pd.CategoricalDtype):
+                data[column] = self.normalize(data[column])
+            columns.append(data[column])
+        categories = sorted(set().union(*(c.cat.categories for c in columns)))
+        for data in frames:
+            if column in data.columns:
+                data[column] = data[column].cat.set_categories(categories)
+        return frames
+
+
+registry = CountryRegistry()
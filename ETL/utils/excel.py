@@ -0,0 +1,134 @@
+"""
+Fast Excel writing for the final outputs
+
+`DataFrame.to_excel` builds a full openpyxl workbook in memory, styling the
+header and creating a cell object per value before anything is saved. The
+fast writer streams plain rows instead: with xlsxwriter (if installed) in
+`constant_memory` mode, otherwise through an openpyxl write-only workbook.
+Frames longer than an Excel sheet allows are split across sheets
+(`Sheet1`, `Sheet1_2`, ...), each with its own header row, and
+`read_excel_sheets` reads such a workbook back as one frame.
+"""
+
+import itertools
+import re
+
+from pandas import read_excel, ExcelFile, concat
+from pandas.api.types import is_numeric_dtype, is_datetime64_any_dtype
+from openpyxl.cell import WriteOnlyCell
+import openpyxl
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+# rows of an Excel sheet, including the header row
+EXCEL_MAX_ROWS = 1048576
+DEFAULT_SHEET = "Sheet1"
+
+
+def column_values(column):
+    """Returns the column as python values with missing values as None"""
+    values = column.tolist()
+    if column.hasnans:
+        missing = column.isna().tolist()
+        values = [None if m else v for v, m in zip(values, missing)]
+    return values
+
+
+def sheet_rows(data, max_rows=EXCEL_MAX_ROWS):
+    """Yields (sheet name, rows) pairs, at most `max_rows - 1` rows a sheet"""
+    columns = [column_values(data[name]) for name in data.columns]
+    rows = zip(*columns)
+    per_sheet = max_rows - 1
+    sheets = max(1, -(-len(data) // per_sheet))
+    for i in range(sheets):
+        name = DEFAULT_SHEET if i == 0 else f"{DEFAULT_SHEET}_{i + 1}"
+        yield name, itertools.islice(rows, per_sheet)
+
+
+def write_with_xlsxwriter(data, filename, max_rows):
+    header = [str(name) for name in data.columns]
+    options = {
+        "constant_memory": True,
+        "default_date_format": "yyyy-mm-dd hh:mm:ss",
+        # write cells the way openpyxl does: inf/nan instead of raising, and
+        # strings starting with "=" or looking like urls as plain strings
+        "nan_inf_to_errors": True,
+        "strings_to_formulas": False,
+        "strings_to_urls": False,
+    }
+    with xlsxwriter.Workbook(str(filename), options) as workbook:
+        for name, rows in sheet_rows(data, max_rows):
+            sheet = workbook.add_worksheet(name)
+            sheet.write_row(0, 0, header)
+            for r, row in enumerate(rows, start=1):
+                sheet.write_row(r, 0, row)
+
+
+def literal_strings(sheet, rows, columns):
+    """
+    Yields `rows` with the strings of `columns` starting with "=" wrapped in
+    string cells, openpyxl would otherwise write them as formulas
+    """
+    for row in rows:
+        row = list(row)
+        for i in columns:
+            value = row[i]
+            if isinstance(value, str) and value.startswith("="):
+                cell = WriteOnlyCell(sheet, value)
+                cell.data_type = "s"
+                row[i] = cell
+        yield row
+
+
+def write_with_openpyxl(data, filename, max_rows):
+    header = [str(name) for name in data.columns]
+    text_columns = [
+        i
+        for i, dtype in enumerate(data.dtypes)
+        if not (is_numeric_dtype(dtype) or is_datetime64_any_dtype(dtype))
+    ]
+    workbook = openpyxl.Workbook(write_only=True)
+    for name, rows in sheet_rows(data, max_rows):
+        sheet = workbook.create_sheet(name)
+        sheet.append(header)
+        if text_columns:
+            rows = literal_strings(sheet, rows, text_columns)
+        for row in rows:
+            sheet.append(row)
+    workbook.save(filename)
+
+
+def write_excel_fast(data, filename, index=False, engine=None, max_rows=None):
+    """
+    Writes `data` to an xlsx file without cell styling. Uses xlsxwriter when
+    installed unless `engine="openpyxl"` is given
+    """
+    if index:
+        data = data.reset_index()
+    engine = engine or ("xlsxwriter" if xlsxwriter is not None else "openpyxl")
+    max_rows = max_rows or EXCEL_MAX_ROWS
+    if engine == "xlsxwriter":
+        if xlsxwriter is None:
+            raise ImportError("xlsxwriter is required for engine='xlsxwriter'")
+        write_with_xlsxwriter(data, filename, max_rows)
+    else:
+        write_with_openpyxl(data, filename, max_rows)
+
+
+def read_excel_sheets(fn, **options):
+    """
+    Reads an xlsx file, joining the sheets `write_excel_fast` split a long
+    frame into. Any other workbook is read like `pandas.read_excel`
+    """
+    with ExcelFile(fn) as workbook:
+        names = workbook.sheet_names
+        split = f"^{re.escape(names[0])}_[0-9]+$"
+        if len(names) == 1 or not all(re.match(split, name) for name in names[1:]):
+            return read_excel(workbook, **options)
+        return concat(
+            [read_excel(workbook, sheet_name=name, **options) for name in names],
+            ignore_index=True,
+        )
@@ -1,16 +1,127 @@
-from pandas import read_csv, read_excel
+from pandas import read_csv, read_parquet
 from pandas import DataFrame
 from pathlib import Path
+import concurrent.futures
+import pyarrow.parquet as pq
+import pyarrow as pa
+import collections
+import time
 import os
 
+from utils.excel import read_excel_sheets, write_excel_fast
+from report.components import timed
+
+
+def arrow_schema(table):
+    """
+    Schema every frame of a stream can be cast to: frames may hold a different
+    number of categories or a column with only missing values
+    """
+    fields = []
+    for field in table.schema:
+        if pa.types.is_dictionary(field.type):
+            field = field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+        elif pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields, metadata=table.schema.metadata)
+
+
+class StreamingConcat:
+    """
+    Concatenates dataframes handed over one at a time. Each frame is converted
+    to an Arrow table on arrival so the caller can drop it, `result` joins the
+    tables without copying and converts them back column by column, releasing
+    the Arrow buffers as it goes. Peak memory stays close to the size of the
+    concatenated frame instead of the inputs plus their concatenation
+    """
+
+    def __init__(self):
+        self.tables = []
+        self.rows = 0
+
+    def append(self, data):
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        self.tables.append(table.cast(arrow_schema(table)))
+        self.rows += len(data)
+
+    def __len__(self):
+        return len(self.tables)
+
+    def result(self):
+        if not self.tables:
+            return DataFrame()
+        table = pa.concat_tables(self.tables, promote_options="permissive")
+        self.tables = []
+        return table.to_pandas(self_destruct=True, split_blocks=True)
+
+
+class ChunkWriter:
+    """
+    Appends dataframes one after the other to a single csv or parquet file.
+    The file is written even when no chunk arrives (e.g an empty input), with
+    `columns` as its header, as loaders look for every transformed file
+    """
+
+    def __init__(self, filename, file_type, columns=None):
+        if file_type not in ("csv", "parquet"):
+            raise ValueError(f"Chunked writes are not supported for {file_type} files")
+        self.filename = filename
+        self.file_type = file_type
+        self.columns = columns
+        self.schema = None
+        self.writer = None
+        self.written = False
+        self.rows = 0
+
+    def append(self, data):
+        if self.file_type == "csv":
+            mode, header = ("a", False) if self.written else ("w", True)
+            data.to_csv(self.filename, mode=mode, header=header, index=False)
+        else:
+            table = pa.Table.from_pandas(data, preserve_index=False)
+            if self.writer is None:
+                self.schema = arrow_schema(table)
+                self.writer = pq.ParquetWriter(self.filename, self.schema)
+            self.writer.write_table(table.cast(self.schema))
+        self.written = True
+        self.rows += len(data)
+
+    def close(self):
+        if not self.written:
+            self.append(DataFrame(columns=self.columns or []))
+        if self.writer is not None:
+            self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
 
 class IOMixin:
 
-    extension_reader = {".xlsx": read_excel, ".csv": read_csv}
+    extension_reader = {
+        ".xlsx": read_excel_sheets,
+        ".csv": read_csv,
+        ".parquet": read_parquet,
+    }
     extension_and_writer = {
         "excel": ("xlsx", DataFrame.to_excel),
+        # streaming writer without cell styling, see utils/excel.py
+        "excel_fast": ("xlsx", write_excel_fast),
         "csv": ("csv", DataFrame.to_csv),
+        # columnar format for intermediates handed between stages
+        "parquet": ("parquet", DataFrame.to_parquet),
     }
+    # SchemaCache used for csv/excel reads (see utils/schema.py)
+    schema_cache = None
+    # files `fetch` reads concurrently in a thread pool (None: one per cpu)
+    fetch_workers = 1
+    # FrameStore holding frames handed over in memory (see utils/store.py)
+    frame_store = None
+    schema_suffixes = (".csv", ".xlsx")
 
     def setup_data_dir(self, data_dir):
         data_dir = data_dir or self.default_data_dir
@@ -34,31 +145,114 @@ class IOMixin:
         self.setup_data_dir(data_dir)
         self.setup_save_dir(save_dir)
 
+    @property
+    def input_dirs(self):
+        """Directories this component reads, used to schedule it after its producers"""
+        data_dir = getattr(self, "data_dir", None)
+        return [data_dir] if data_dir is not None else []
+
+    @property
+    def output_dirs(self):
+        return [self.save_dir]
+
     def get_extension_and_writer(self):
         return self.extension_and_writer.get(self.save_file_type)
 
+    def fingerprint_config(self):
+        """Settings that affect the output, used to detect configuration changes"""
+        return {
+            "class": self.__class__.__qualname__,
+            "data_dir": str(getattr(self, "data_dir", "")),
+            "save_dir": str(self.save_dir),
+            "save_file_type": getattr(self, "save_file_type", None),
+            "compact_dtypes": self.schema_cache is not None,
+        }
+
     def write(self, name, data):
         ext, writer = self.get_extension_and_writer()
         filename = self.save_dir / f"{name}.{ext}"
         writer(data, filename, index=False)
+        return filename
 
-    def fetch(self):
+    def list_files(self):
         try:
-            files = [f for f in self.data_dir.iterdir() if f.is_file()]
+            files = sorted(f for f in self.data_dir.iterdir() if f.is_file())
         except Exception as e:
             self.logger.exception(
                 "Encountered an error trying to read %s", self.data_dir
             )
             raise e
-        else:
-            self.logger.info(
-                "%d files found in %s filder", len(files), self.data_dir.name
-            )
+        if self.frame_store is not None:
+            stored = self.frame_store.files(self.data_dir)
+            files = sorted(set(files).union(stored))
+        self.logger.info("%d files found in %s filder", len(files), self.data_dir.name)
+        return files
+
+    def input_size(self, fn):
+        """Size of an input, in memory for frames held by the frame store"""
+        if self.frame_store is not None and fn in self.frame_store:
+            return self.frame_store.size(fn)
+        return fn.stat().st_size
+
+    def fetch_worker_count(self, files):
+        workers = self.fetch_workers or os.cpu_count() or 1
+        return max(1, min(workers, files))
+
+    def fetch_pool(self, workers):
+        # threads rather than processes: frames read in a process would be
+        # pickled back to the loader, which costs about as much as the read
+        return concurrent.futures.ThreadPoolExecutor(workers)
+
+    def timed_read(self, fn):
+        """`read` returning its cpu time too, measured in the pool thread"""
+        return timed(time.thread_time, self.read, fn)
+
+    def add_fetch_cpu_time(self, seconds):
+        metric = getattr(self, "metric", None)
+        if metric is not None:
+            metric.add_worker_cpu_time(seconds)
+
+    def fetch(self, files=None):
+        """Reads `files` (all data files by default), returned in the same order"""
+        files = self.list_files() if files is None else files
+        workers = self.fetch_worker_count(len(files))
+        if workers == 1:
+            return [self.read(f) for f in files]
+        with self.fetch_pool(workers) as executor:
+            results = list(executor.map(self.timed_read, files))
+        self.add_fetch_cpu_time(sum(cpu for _, cpu in results))
+        return [data for data, _ in results]
 
-        datasets = [self.read(f) for f in files]
-        return datasets
+    def iter_fetch(self, files=None):
+        """
+        Lazy `fetch`: yields the datasets one at a time, in file order. With
+        more than one fetch worker the next files are read ahead, at most one
+        per worker, while the current one is consumed
+        """
+        files = self.list_files() if files is None else files
+        workers = self.fetch_worker_count(len(files))
+        if workers == 1:
+            for fn in files:
+                yield self.read(fn)
+            return
+        with self.fetch_pool(workers) as executor:
+            pending = collections.deque()
+            for fn in files:
+                pending.append(executor.submit(self.timed_read, fn))
+                if len(pending) > workers:
+                    data, cpu = pending.popleft().result()
+                    self.add_fetch_cpu_time(cpu)
+                    yield data
+            while pending:
+                data, cpu = pending.popleft().result()
+                self.add_fetch_cpu_time(cpu)
+                yield data
 
-    def read(self, fn):
+    def read(self, fn, **options):
+        if self.frame_store is not None and fn in self.frame_store:
+            return self.frame_store.get(fn)
         ext = fn.suffix
         reader = self.extension_reader.get(ext)
-        return reader(fn)
+        if self.schema_cache is not None and ext in self.schema_suffixes:
+            return self.schema_cache.read(reader, fn, **options)
+        return reader(fn, **options)
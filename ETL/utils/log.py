@@ -1,7 +1,35 @@
+"""
+Logging handlers and formatter used by configs/log.json
+
+Records are handed to the listener thread untouched by DeferredQueueHandler,
+so the logging thread (e.g the extraction event loop) only creates the
+record and puts it on the queue. Messages are merged with their arguments,
+serialized to JSON and written on the listener thread, where
+BatchFileHandler writes whatever accumulated in one call and
+BatchQueueListener flushes every handler whenever the queue runs empty.
+JSON is encoded with orjson when it is installed.
+"""
+
+import logging.handlers
 import datetime as dt
 import logging
+import queue
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# reused instead of json.dumps building an encoder for every record
+json_encoder = json.JSONEncoder(default=str, separators=(",", ":"))
+
+
+def dumps(message):
+    if orjson is not None:
+        return orjson.dumps(message, default=str).decode()
+    return json_encoder.encode(message)
+
 
 class JsonFormatter(logging.Formatter):
 
@@ -11,7 +39,7 @@ class JsonFormatter(logging.Formatter):
 
     def format(self, record):
         message = self._prepare_log_dict(record)
-        return json.dumps(message, default=str)
+        return dumps(message)
 
     def _prepare_log_dict(self, record):
         fields = {
@@ -27,14 +55,92 @@ class JsonFormatter(logging.Formatter):
         if record.stack_info is not None:
             fields["stack_info"] = self.formatStack(record.stack_info)
 
-        message = dict()
-
-        for key, val in self.fmt_keys.items():
-            msg_val = fields.pop(val, None)
-            if msg_val is None:
-                msg_val = getattr(record, val)
-            message[key] = msg_val
+        message = {
+            key: fields.pop(val) if val in fields else getattr(record, val)
+            for key, val in self.fmt_keys.items()
+        }
 
         message.update(fields)
 
         return message
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on the queue as they are. The stdlib QueueHandler formats
+    the message and copies the record on the logging thread so the record
+    can be pickled; the queue here is only read by a listener thread of the
+    same process, which does all the formatting. Arguments are merged into
+    the message on that thread, so they must not be mutated after logging
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class BatchQueueListener(logging.handlers.QueueListener):
+    """
+    Flushes the handlers every time the queue runs empty: while records
+    arrive faster than they are written they are written in batches, once
+    logging settles down everything is on disk
+    """
+
+    def dequeue(self, block):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            self.flush()
+            return self.queue.get(block)
+
+    def flush(self):
+        for handler in self.handlers:
+            handler.flush()
+
+    def stop(self):
+        super().stop()
+        self.flush()
+
+
+class BatchFileHandler(logging.FileHandler):
+    """
+    FileHandler buffering formatted records and writing them in a single
+    call, when `capacity` records are buffered, a record at `flush_level` or
+    above arrives or the handler is flushed
+    """
+
+    def __init__(
+        self,
+        filename,
+        mode="a",
+        encoding=None,
+        delay=False,
+        capacity=1000,
+        flush_level=logging.ERROR,
+    ):
+        super().__init__(filename, mode, encoding, delay)
+        self.capacity = capacity
+        self.flush_level = flush_level
+        self.buffer = []
+
+    def emit(self, record):
+        try:
+            self.buffer.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+            return
+        if len(self.buffer) >= self.capacity or record.levelno >= self.flush_level:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if self.buffer:
+                if self.stream is None:
+                    self.stream = self._open()
+                lines = self.buffer
+                self.buffer = []
+                self.stream.write(self.terminator.join(lines) + self.terminator)
+            super().flush()
+
+    def close(self):
+        self.flush()
+        super().close()
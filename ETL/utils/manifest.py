@@ -0,0 +1,133 @@
+"""
+Manifest of input/output fingerprints used for incremental pipeline runs
+
+Every transformer/loader gets an entry keyed by its class and directories
+holding a hash of its configuration (class source + `fingerprint_config`),
+the fingerprints of the input files it last consumed and the files it
+produced. A stage whose configuration and inputs are unchanged, and whose
+outputs are still on disk, does not need to run again.
+"""
+
+from pathlib import Path
+import threading
+import hashlib
+import inspect
+import json
+import os
+
+
+def file_fingerprint(path, previous=None):
+    """
+    Returns the size, modification time and sha256 of `path`.
+    The file is only hashed again when its size or mtime differ from `previous`,
+    only the sha256 tells whether the content changed
+    """
+    stat = os.stat(path)
+    fingerprint = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+    if (
+        previous is not None
+        and previous.get("size") == fingerprint["size"]
+        and previous.get("mtime") == fingerprint["mtime"]
+    ):
+        fingerprint["sha256"] = previous.get("sha256")
+        return fingerprint
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    fingerprint["sha256"] = digest.hexdigest()
+    return fingerprint
+
+
+class Manifest:
+
+    default_path = "data/.manifest.json"
+
+    def __init__(self, path=None):
+        path = path or self.default_path
+        self.path = path if isinstance(path, Path) else Path(path)
+        self.stages = dict()
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not self.path.is_file():
+            return
+        try:
+            with open(self.path) as f:
+                self.stages = json.load(f)
+        except (OSError, ValueError):
+            # an unreadable manifest only costs a full run
+            self.stages = dict()
+
+    def save(self):
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix(".tmp")
+            with open(temp_path, "w") as f:
+                json.dump(self.stages, f, indent=2)
+            os.replace(temp_path, self.path)
+
+    def key(self, component):
+        cls = component.__class__
+        return f"{cls.__module__}.{cls.__qualname__}:{component.data_dir}->{component.save_dir}"
+
+    def config_hash(self, component):
+        digest = hashlib.sha256()
+        try:
+            digest.update(inspect.getsource(component.__class__).encode())
+        except (OSError, TypeError):
+            digest.update(component.__class__.__qualname__.encode())
+        config = json.dumps(component.fingerprint_config(), sort_keys=True, default=str)
+        digest.update(config.encode())
+        return digest.hexdigest()
+
+    def entry(self, component):
+        """Returns the recorded entry of `component` if its configuration is unchanged"""
+        entry = self.stages.get(self.key(component))
+        if entry is None or entry.get("config") != self.config_hash(component):
+            return None
+        return entry
+
+    def changed_inputs(self, component, files):
+        """Returns the files in `files` whose content changed since the last run"""
+        entry = self.entry(component)
+        if entry is None:
+            return list(files)
+        inputs = entry.get("inputs", {})
+        changed = []
+        for fn in files:
+            previous = inputs.get(str(fn))
+            # files rewritten with the same bytes (e.g by every streaming
+            # download) get a new mtime but are not changed
+            if previous is None or file_fingerprint(fn, previous)[
+                "sha256"
+            ] != previous.get("sha256"):
+                changed.append(fn)
+        return changed
+
+    def is_current(self, component, files):
+        """
+        True when `component` last ran with the same configuration on exactly
+        the same inputs and all of its outputs still exist
+        """
+        entry = self.entry(component)
+        if entry is None:
+            return False
+        if set(entry.get("inputs", {})) != {str(fn) for fn in files}:
+            return False
+        if not all(Path(fn).is_file() for fn in entry.get("outputs", [])):
+            return False
+        return not self.changed_inputs(component, files)
+
+    def record(self, component, files, outputs):
+        key = self.key(component)
+        previous = self.stages.get(key, {}).get("inputs", {})
+        self.stages[key] = {
+            "config": self.config_hash(component),
+            "inputs": {
+                str(fn): file_fingerprint(fn, previous.get(str(fn))) for fn in files
+            },
+            "outputs": [str(fn) for fn in outputs],
+        }
@@ -0,0 +1,152 @@
+"""
+Per-source dtype cache and lossless dtype downcasting for csv/excel reads
+
+pandas infers dtypes from scratch on every read, leaving labels as object
+columns and every number as int64/float64. After a file has been read its
+columns are downcast where no value changes (repeated strings to category,
+integers to the smallest int type holding their range, floats to float32
+when every value round-trips) and the resulting dtypes are cached for its
+source. Files of the same source (e.g every GTI year) are then read with
+those dtypes as reader hints, so labels are parsed straight into categories.
+A hint that no longer fits the data only costs a read with full inference.
+"""
+
+from pathlib import Path
+import logging
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("ETL.Schema")
+
+# object columns with at most this share of distinct values become categories
+CATEGORY_RATIO = 0.5
+INT_TYPES = (np.int8, np.int16, np.int32)
+
+
+def source_key(fn):
+    """Files only differing in the numbers in their name (years) share a source"""
+    fn = Path(fn)
+    return f"{fn.parent.name}/{re.sub(r'[0-9]+', '#', fn.name)}"
+
+
+def compact_column(column):
+    """Returns `column` downcast to the smallest dtype holding the same values"""
+    dtype = column.dtype
+    if dtype == object:
+        if len(column) and pd.api.types.infer_dtype(column, skipna=True) == "string":
+            if column.nunique() <= max(1, len(column) * CATEGORY_RATIO):
+                return column.astype("category")
+        return column
+    if pd.api.types.is_bool_dtype(dtype):
+        return column
+    if pd.api.types.is_integer_dtype(dtype) and not isinstance(
+        dtype, pd.api.extensions.ExtensionDtype
+    ):
+        if not len(column):
+            return column
+        low, high = column.min(), column.max()
+        for int_type in INT_TYPES:
+            info = np.iinfo(int_type)
+            if np.dtype(int_type).itemsize >= dtype.itemsize:
+                break
+            if info.min <= low and high <= info.max:
+                return column.astype(int_type)
+        return column
+    if dtype == np.float64:
+        values = column.to_numpy()
+        narrow = values.astype(np.float32)
+        if np.array_equal(narrow.astype(np.float64), values, equal_nan=True):
+            return pd.Series(narrow, index=column.index, name=column.name)
+    return column
+
+
+def compact(data):
+    """Downcasts every column of `data` losslessly (in place) and returns it"""
+    for name in data.columns:
+        column = compact_column(data[name])
+        if column is not data[name]:
+            data[name] = column
+    return data
+
+
+def reader_dtypes(schema):
+    """
+    Reader `dtype` hints for a cached schema: categories are parsed directly,
+    numbers are read at full width and checked again by `compact`
+    """
+    hints = dict()
+    for column, dtype in schema.items():
+        if dtype == "category":
+            hints[column] = "category"
+        elif dtype.startswith("int"):
+            hints[column] = "int64"
+        elif dtype.startswith("float"):
+            hints[column] = "float64"
+    return hints
+
+
+class SchemaCache:
+
+    def __init__(self, path):
+        self.path = path if isinstance(path, Path) else Path(path)
+        self.schemas = dict()
+        # schemas inferred since the cache was loaded, sent back by workers
+        self.updated = dict()
+        self.hits = 0
+        self.load()
+
+    def load(self):
+        if not self.path.is_file():
+            return
+        try:
+            with open(self.path) as f:
+                self.schemas = json.load(f)
+        except (OSError, ValueError):
+            self.schemas = dict()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(self.schemas, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def merge(self, schemas):
+        self.schemas.update(schemas)
+
+    def read(self, reader, fn, **options):
+        """
+        Reads `fn` with the cached dtypes of its source as hints (explicit
+        `dtype` options take precedence), then downcasts and caches the
+        result. Chunked reads only use the hints, empty frames are not cached
+        """
+        key = source_key(fn)
+        explicit = options.get("dtype") or dict()
+        schema = self.schemas.get(key)
+        if schema is None or not isinstance(explicit, dict):
+            data = reader(fn, **options)
+        else:
+            hints = {**reader_dtypes(schema), **explicit}
+            try:
+                data = reader(fn, **{**options, "dtype": hints})
+                self.hits += 1
+            except (ValueError, TypeError, OverflowError) as e:
+                logger.warning(
+                    f"Cached schema of {key} does not fit {fn.name} ({e}), inferring dtypes"
+                )
+                data = reader(fn, **options)
+        if options.get("chunksize"):
+            return data
+        data = compact(data)
+        if data.empty:
+            # nothing to infer from, e.g a header-only file or `nrows=0`
+            return data
+        inferred = {column: str(dtype) for column, dtype in data.dtypes.items()}
+        if schema != inferred:
+            self.schemas[key] = inferred
+            self.updated[key] = inferred
+        return data
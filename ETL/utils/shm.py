@@ -0,0 +1,137 @@
+"""
+Dataframes handed between processes through shared memory
+
+A transformer worker returning a dataframe pickles it through the process
+pool's pipe and the parent unpickles it again. `SharedFrame.create` instead
+writes the frame once, as an Arrow IPC stream, into a
+`multiprocessing.shared_memory` block and only the small handle is pickled.
+The parent (or a loader) maps the block and reads the Arrow table without
+copying it; `to_pandas` converts it back to a dataframe.
+
+The block outlives the worker: whoever holds the handle must call
+`release` once the frame is no longer needed. Blocks left behind are
+removed by the multiprocessing resource tracker when the pipeline exits.
+"""
+
+from multiprocessing import shared_memory, resource_tracker
+import threading
+import os
+
+import pyarrow as pa
+
+
+def write_stream(table, sink):
+    # writer and buffers go out of scope on return, a shared memory block can
+    # only be closed once nothing points into it
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    sink.close()
+
+
+class SharedFrame:
+    """
+    Picklable handle to a dataframe stored in a shared memory block.
+    The mapping is shared by every reader of the handle (e.g threads of a
+    loader `fetch` or of the DAG scheduler), mapping and unmapping it is
+    guarded by a lock
+    """
+
+    def __init__(self, name, size, rows, nbytes):
+        self.name = name
+        self.size = size
+        self.rows = rows
+        self.nbytes = nbytes
+        self.memory = None
+        self.lock = threading.RLock()
+
+    @classmethod
+    def create(cls, data):
+        """Writes `data` to a new shared memory block and returns its handle"""
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        sink = pa.MockOutputStream()
+        write_stream(table, sink)
+        memory = shared_memory.SharedMemory(create=True, size=sink.size())
+        try:
+            write_stream(table, pa.FixedSizeBufferWriter(pa.py_buffer(memory.buf)))
+        except BaseException:
+            memory.close()
+            memory.unlink()
+            raise
+        memory.close()
+        # the block belongs to whoever receives the handle, not to this worker
+        # whose resource tracker would remove it when the worker exits
+        if os.name == "posix":
+            resource_tracker.unregister(f"/{memory.name}", "shared_memory")
+        return cls(memory.name, sink.size(), table.num_rows, table.nbytes)
+
+    def table(self):
+        """
+        Maps the block and returns the Arrow table stored in it, without
+        copying. The table is only valid until `release` is called
+        """
+        with self.lock:
+            if self.memory is None:
+                self.memory = shared_memory.SharedMemory(name=self.name)
+            buffer = pa.py_buffer(self.memory.buf)[: self.size]
+            return pa.ipc.open_stream(buffer).read_all()
+
+    def to_pandas(self):
+        """Returns the stored frame as a dataframe independent of the block"""
+        data = self.table().to_pandas()
+        if not self.close():
+            # some columns (e.g categorical codes) were converted without a
+            # copy and still point into the block
+            data = data.copy()
+            self.close()
+        return data
+
+    def close(self):
+        """
+        Unmaps the block, unless an Arrow table still points into it.
+        Returns whether the block is unmapped
+        """
+        with self.lock:
+            if self.memory is None:
+                return True
+            try:
+                self.memory.close()
+            except BufferError:
+                return False
+            self.memory = None
+            return True
+
+    def release(self):
+        """Unmaps and removes the shared memory block"""
+        with self.lock:
+            self.close()
+            memory = self.memory or shared_memory.SharedMemory(name=self.name)
+            if self.memory is None:
+                memory.close()
+            memory.unlink()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["memory"] = None
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+        # track the block in the receiving process until it is released
+        if os.name == "posix":
+            resource_tracker.register(f"/{self.name}", "shared_memory")
+
+    def __len__(self):
+        return self.rows
+
+
+def share(data):
+    """
+    Returns a SharedFrame holding `data`, or `data` itself when it has
+    columns Arrow cannot convert (e.g mixed types), which are then pickled
+    """
+    try:
+        return SharedFrame.create(data)
+    except pa.ArrowException:
+        return data
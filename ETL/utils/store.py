@@ -0,0 +1,88 @@
+"""
+In-process handoff of transformed frames to the loaders
+
+When the whole pipeline runs in one process, writing every transformed
+frame to `data/*/transformed` only for a loader to parse it back is a
+serialization round trip for nothing. With a FrameStore the transformers
+hand their outputs to the store instead, keyed on the path they would have
+written, and loaders reading that directory get the frames straight from
+memory. Files of the directory that are not in the store (e.g outputs of
+chunked transforms) are still read from disk. Writing the intermediates as
+well is opt-in (`persist=True`), incremental runs need them on disk.
+
+With `shared_memory=True` transformer workers put their outputs in shared
+memory as Arrow IPC streams (see utils/shm.py) and only hand the store a
+SharedFrame handle, so the frames are not pickled back to the parent.
+"""
+
+from pathlib import Path
+import threading
+
+from utils.shm import SharedFrame
+
+
+class FrameStore:
+
+    def __init__(self, persist=False, shared_memory=False):
+        self.persist = persist
+        self.shared_memory = shared_memory
+        self.frames = dict()
+        self.sizes = dict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(path):
+        return Path(path).resolve()
+
+    def put(self, path, data):
+        key = self.key(path)
+        if isinstance(data, SharedFrame):
+            size = data.nbytes
+        else:
+            size = int(data.memory_usage(deep=True).sum())
+        with self.lock:
+            replaced = self.frames.get(key)
+            self.frames[key] = data
+            self.sizes[key] = size
+        if isinstance(replaced, SharedFrame):
+            replaced.release()
+
+    def get(self, path):
+        """
+        Returns a shallow copy of the stored frame, so a loader replacing
+        columns does not change what other loaders of the same directory get.
+        Frames in shared memory are converted to a new dataframe every time
+        """
+        data = self.frames[self.key(path)]
+        if isinstance(data, SharedFrame):
+            return data.to_pandas()
+        return data.copy(deep=False)
+
+    def size(self, path):
+        """In-memory (Arrow for shared frames) size of the stored frame in bytes"""
+        return self.sizes[self.key(path)]
+
+    def files(self, directory):
+        """Paths of the frames stored for `directory`"""
+        parent = self.key(directory)
+        with self.lock:
+            names = [key.name for key in self.frames if key.parent == parent]
+        return [Path(directory) / name for name in names]
+
+    @property
+    def nbytes(self):
+        return sum(self.sizes.values())
+
+    def clear(self):
+        with self.lock:
+            for data in self.frames.values():
+                if isinstance(data, SharedFrame):
+                    data.release()
+            self.frames.clear()
+            self.sizes.clear()
+
+    def __contains__(self, path):
+        return self.key(path) in self.frames
+
+    def __len__(self):
+        return len(self.frames)
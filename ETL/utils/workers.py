@@ -0,0 +1,102 @@
+"""
+Persistent process pool shared by the transformers of a pipeline run
+
+Starting a pool per transformer means every transformer pays for spawning
+its workers and importing pandas in each of them, even when it only has a
+couple of files to process. A `WorkerPool` is created once by the pipeline,
+its workers import the heavy modules up front (`warm_up`) and stay alive
+between transformers. The pool is created once with `max_workers` workers
+and never replaced, so transformers running at the same time share one
+budget of processes. Workers are started from a forkserver (forking the
+multithreaded pipeline process is unsafe) and only as tasks are queued, so
+a transformer with a couple of files does not start a full set of workers.
+"""
+
+import concurrent.futures
+import multiprocessing
+import importlib
+import functools
+import threading
+import logging
+import time
+import os
+
+import tqdm
+
+from report.components import timed
+
+logger = logging.getLogger("ETL.Workers")
+
+# imported in every worker as soon as it starts
+WARM_MODULES = (
+    "numpy",
+    "pandas",
+    "pyarrow.parquet",
+    "openpyxl",
+    "utils.io",
+    "utils.countries",
+)
+
+
+def warm_up(modules):
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+class WorkerPool:
+
+    def __init__(self, max_workers=None, modules=WARM_MODULES):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.modules = modules
+        self.executor = None
+        self._lock = threading.Lock()
+
+    def get_executor(self):
+        """Returns the pool's executor, starting it on first use"""
+        with self._lock:
+            if self.executor is None:
+                logger.info(f"Starting worker pool with {self.max_workers} workers")
+                self.executor = concurrent.futures.ProcessPoolExecutor(
+                    self.max_workers,
+                    mp_context=multiprocessing.get_context("forkserver"),
+                    initializer=warm_up,
+                    initargs=(self.modules,),
+                )
+            return self.executor
+
+    def map(self, fn, items, desc=None, metric=None):
+        """
+        Runs `fn` on every item in the pool and returns the results in order.
+        The cpu time the workers spent is added to `metric` when given
+        """
+        items = list(items)
+        if not items:
+            return []
+        executor = self.get_executor()
+        task = functools.partial(timed, time.process_time, fn)
+        futures = [executor.submit(task, item) for item in items]
+        with tqdm.tqdm(total=len(futures), desc=desc) as pbar:
+            for _ in concurrent.futures.as_completed(futures):
+                pbar.update(1)
+        results = [future.result() for future in futures]
+        if metric is not None:
+            metric.add_worker_cpu_time(sum(cpu for _, cpu in results))
+        return [result for result, _ in results]
+
+    def workers_for(self, tasks):
+        return max(1, min(tasks, self.max_workers))
+
+    def close(self):
+        with self._lock:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()